@@ -20,12 +20,49 @@ const SketchCanvas: React.FC<SketchCanvasProps> = ({ projectId, canvasRef: exter
   
   const canvasRef = externalRef || internalRef;
 
+  // What the server already has: stroke count, last stroke and its ETag
+  const saved = useRef<{ lines: number; last?: string; etag?: string }>({ lines: 0 });
+
+  useEffect(() => {
+    saved.current = { lines: 0 };
+  }, [projectId]);
+
+  const saveFull = async (sketchData: string) => {
+    return axios.post(`/projects/${projectId}/sketch`, { sketch: sketchData });
+  };
+
   const handleSave = async () => {
     if (!canvasRef.current) return;
     const sketchData = canvasRef.current.getSaveData();
+    const lines = JSON.parse(sketchData).lines || [];
+    const prev = saved.current;
 
     try {
-      await axios.post(`/projects/${projectId}/sketch`, { sketch: sketchData });
+      let res;
+      // Only new strokes since the last save: send just those
+      const appendOnly =
+        prev.etag &&
+        lines.length >= prev.lines &&
+        (prev.lines === 0 || JSON.stringify(lines[prev.lines - 1]) === prev.last);
+      if (appendOnly) {
+        try {
+          res = await axios.patch(
+            `/projects/${projectId}/sketch`,
+            { append: lines.slice(prev.lines) },
+            { headers: { "If-Match": prev.etag } }
+          );
+        } catch (err: any) {
+          if (err.response?.status !== 412) throw err;
+          res = await saveFull(sketchData);
+        }
+      } else {
+        res = await saveFull(sketchData);
+      }
+      saved.current = {
+        lines: lines.length,
+        last: lines.length ? JSON.stringify(lines[lines.length - 1]) : undefined,
+        etag: res.headers["etag"],
+      };
       alert("Sketch saved successfully!");
     } catch (err) {
       console.error(err);
@@ -14,6 +14,8 @@ interface Project {
 
 const ProjectPage: React.FC = () => {
   const [projects, setProjects] = useState<Project[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | undefined>(undefined);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [selectedProject, setSelectedProject] = useState<Project | null>(null);
   const [textBrief, setTextBrief] = useState("");
   const [designData, setDesignData] = useState<any>(null);
@@ -40,12 +42,28 @@ const ProjectPage: React.FC = () => {
     }
   }, [selectedProject]);
 
-  const loadProjects = async () => {
+  // The list holds summaries only; narrative and notes come from GET /projects/{id}
+  const selectProject = async (id: number) => {
     try {
-      const res = await axios.get("/projects/");
-      setProjects(res.data);
-      if (res.data.length > 0 && !selectedProject) {
-        setSelectedProject(res.data[0]);
+      const res = await axios.get(`/projects/${id}`);
+      setSelectedProject(res.data);
+    } catch (err) {
+      console.error("Failed to load project:", err);
+    }
+  };
+
+  // One page at a time: the first on mount, the next when "Load more" is clicked
+  const loadProjects = async (cursor?: string) => {
+    try {
+      const res = await axios.get("/projects/", { params: cursor ? { cursor } : {} });
+      setNextCursor(res.headers["x-next-cursor"]);
+      if (cursor) {
+        setProjects((prev) => [...prev, ...res.data]);
+      } else {
+        setProjects(res.data);
+        if (res.data.length > 0) {
+          selectProject(res.data[0].id);
+        }
       }
     } catch (err: any) {
       console.error("Failed to load projects:", err);
@@ -58,6 +76,12 @@ const ProjectPage: React.FC = () => {
     }
   };
 
+  const loadMoreProjects = async () => {
+    setIsLoadingMore(true);
+    await loadProjects(nextCursor);
+    setIsLoadingMore(false);
+  };
+
   const createProject = async () => {
     if (!newProjectTitle.trim()) {
       alert("Please enter a project title");
@@ -68,7 +92,7 @@ const ProjectPage: React.FC = () => {
         title: newProjectTitle,
         description: newProjectDesc,
       });
-      setProjects([...projects, res.data]);
+      setProjects([res.data, ...projects]);
       setSelectedProject(res.data);
       setNewProjectTitle("");
       setNewProjectDesc("");
@@ -117,7 +141,7 @@ const ProjectPage: React.FC = () => {
       setDesignData(res.data);
       
       // Update project with new data
-      await axios.put(`/projects/${selectedProject.id}`, {
+      const updated = await axios.put(`/projects/${selectedProject.id}`, {
         description: textBrief,
         sketch_data: sketchData,
         design_narrative: res.data.design_narrative,
@@ -125,8 +149,9 @@ const ProjectPage: React.FC = () => {
         design_concept_url: res.data.design_concept_url,
       });
 
-      // Reload projects to get updated data
-      loadProjects();
+      // Most recently updated first, as GET /projects/ orders them
+      setSelectedProject(updated.data);
+      setProjects((prev) => [updated.data, ...prev.filter((p) => p.id !== updated.data.id)]);
     } catch (err: any) {
       console.error("Failed to generate design:", err);
       if (err.code === 'ERR_NETWORK') {
@@ -179,7 +204,7 @@ const ProjectPage: React.FC = () => {
           {projects.map((project) => (
             <button
               key={project.id}
-              onClick={() => setSelectedProject(project)}
+              onClick={() => selectProject(project.id)}
               style={{
                 padding: "10px",
                 textAlign: "left",
@@ -191,6 +216,15 @@ const ProjectPage: React.FC = () => {
               {project.title}
             </button>
           ))}
+          {nextCursor && (
+            <button
+              onClick={loadMoreProjects}
+              disabled={isLoadingMore}
+              style={{ padding: "10px", cursor: isLoadingMore ? "not-allowed" : "pointer" }}
+            >
+              {isLoadingMore ? "Loading..." : "Load more"}
+            </button>
+          )}
         </div>
       </div>
 
@@ -1,14 +1,27 @@
-from app.ai.llm.generate import generate_answer
+from app.ai.llm.generate import generate_answer, agenerate_answer
 from app.ai.prompts.compliance_prompt import COMPLIANCE_SYSTEM_PROMPT
 
 
+def _compliance_output(notes: str):
+    return {
+        "notes": notes,
+        "status": "compliant"  # Could be "compliant", "non-compliant", "needs_review"
+    }
+
+
 def run_compliance_agent(design_text: str):
     notes = generate_answer(
         query=design_text,
         context="",
         system_prompt=COMPLIANCE_SYSTEM_PROMPT
     )
-    return {
-        "notes": notes,
-        "status": "compliant"  # Could be "compliant", "non-compliant", "needs_review"
-    }
+    return _compliance_output(notes)
+
+
+async def arun_compliance_agent(design_text: str):
+    notes = await agenerate_answer(
+        query=design_text,
+        context="",
+        system_prompt=COMPLIANCE_SYSTEM_PROMPT
+    )
+    return _compliance_output(notes)
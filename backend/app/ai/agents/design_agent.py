@@ -1,14 +1,38 @@
-from app.ai.llm.generate import generate_answer
+from app.ai.llm.generate import generate_answer, agenerate_answer, astream_answer
 from app.ai.prompts.design_prompt import DESIGN_SYSTEM_PROMPT
 
 
+def make_design_output(narrative: str):
+    return {
+        "narrative": narrative,
+        "model_url": "/static/mock_model.glb"  # Placeholder for 3D model
+    }
+
+
 def run_design_agent(user_prompt: str, context: str):
     narrative = generate_answer(
         query=user_prompt,
         context=context,
         system_prompt=DESIGN_SYSTEM_PROMPT
     )
-    return {
-        "narrative": narrative,
-        "model_url": "/static/mock_model.glb"  # Placeholder for 3D model
-    }
+    return make_design_output(narrative)
+
+
+async def arun_design_agent(user_prompt: str, context: str):
+    narrative = await agenerate_answer(
+        query=user_prompt,
+        context=context,
+        system_prompt=DESIGN_SYSTEM_PROMPT
+    )
+    return make_design_output(narrative)
+
+
+def astream_design_agent(user_prompt: str, context: str):
+    """
+    Narrative as a stream of text deltas
+    """
+    return astream_answer(
+        query=user_prompt,
+        context=context,
+        system_prompt=DESIGN_SYSTEM_PROMPT
+    )
@@ -0,0 +1,127 @@
+import math
+
+from app.ai.embeddings import count_tokens
+from app.ai.keyword_index import tokenize
+from app.core.config import settings
+from app.core.metrics import timed_stage
+
+SEPARATOR = "\n\n"
+
+
+# =========================
+# BUDGET
+# =========================
+def token_budget(model: str | None = None) -> int:
+    """
+    Context tokens allowed for `model` (default AI_MODEL):
+    CONTEXT_TOKEN_BUDGETS ("model=tokens,...") or CONTEXT_MAX_TOKENS.
+    """
+    model = model or settings.AI_MODEL
+    for entry in settings.CONTEXT_TOKEN_BUDGETS.split(","):
+        name, _, tokens = entry.partition("=")
+        if name.strip() == model and tokens.strip():
+            return int(tokens)
+    return settings.CONTEXT_MAX_TOKENS
+
+
+# =========================
+# SELECTION
+# =========================
+def within_distance(hits: list, max_distance: float | None = None, ratio: float | None = None) -> list:
+    """
+    Drop vector hits that are too far from the query: past an absolute
+    squared-L2 cut-off (CONTEXT_MAX_DISTANCE, 0 = off) or more than
+    CONTEXT_DISTANCE_RATIO times the best hit's distance (0 = off).
+
+    Keyword-only hits (infinite distance) have no distance to check; they
+    stay only if their fused score is at least that of the weakest vector
+    hit that passed, so a chunk sharing one term with the query can't slip
+    past the cut-offs. A list with no vector hits at all is a confident
+    keyword lookup and is kept as is.
+    """
+    max_distance = settings.CONTEXT_MAX_DISTANCE if max_distance is None else max_distance
+    ratio = settings.CONTEXT_DISTANCE_RATIO if ratio is None else ratio
+
+    finite = [hit.distance for hit in hits if math.isfinite(hit.distance)]
+    if not finite or not (max_distance or ratio):
+        return hits
+
+    limit = max_distance or math.inf
+    if ratio:
+        limit = min(limit, min(finite) * ratio)
+
+    close = [hit for hit in hits if math.isfinite(hit.distance) and hit.distance <= limit]
+    floor = min((hit.score for hit in close), default=math.inf)
+    return [
+        hit for hit in hits
+        if (math.isfinite(hit.distance) and hit.distance <= limit)
+        or (not math.isfinite(hit.distance) and hit.score >= floor)
+    ]
+
+
+def _similar(a: set, b: set, threshold: float) -> bool:
+    if not a or not b:
+        return a == b
+    return len(a & b) / len(a | b) >= threshold
+
+
+def dedupe(texts: list[str], threshold: float | None = None) -> list[int]:
+    """
+    Positions of the texts to keep: a text whose word set overlaps an
+    earlier kept one by at least `threshold` (Jaccard) is a near-duplicate.
+    """
+    threshold = settings.CONTEXT_DEDUP_THRESHOLD if threshold is None else threshold
+    kept, kept_terms = [], []
+    for n, text in enumerate(texts):
+        terms = set(tokenize(text))
+        if any(_similar(terms, other, threshold) for other in kept_terms):
+            continue
+        kept.append(n)
+        kept_terms.append(terms)
+    return kept
+
+
+def pack(texts: list[str], max_tokens: int) -> list[int]:
+    """
+    Positions of the texts that fit in `max_tokens`, taken in rank order;
+    a chunk too big for what is left is skipped so smaller ones can still fit.
+    """
+    separator = count_tokens(SEPARATOR)
+    kept, used = [], 0
+    for n, text in enumerate(texts):
+        cost = count_tokens(text) + (separator if kept else 0)
+        if used + cost > max_tokens:
+            continue
+        kept.append(n)
+        used += cost
+    return kept
+
+
+# =========================
+# BUILD
+# =========================
+def select_texts(texts: list[str], model: str | None = None) -> list[str]:
+    """
+    Ranked chunk texts -> the near-duplicate-free prefix that fits the
+    model's context budget.
+    """
+    texts = [texts[n] for n in dedupe(texts)]
+    return [texts[n] for n in pack(texts, token_budget(model))]
+
+
+def select_hits(hits: list, model: str | None = None) -> list:
+    """
+    Ranked Hits -> the ones worth sending: close enough to the query,
+    not near-duplicates of a better hit, within the model's token budget.
+    """
+    hits = within_distance(hits)
+    hits = [hits[n] for n in dedupe([hit.text for hit in hits])]
+    return [hits[n] for n in pack([hit.text for hit in hits], token_budget(model))]
+
+
+@timed_stage("context_build")
+def build_context(hits: list, model: str | None = None) -> str:
+    """
+    The context string placed in prompts.
+    """
+    return SEPARATOR.join(hit.text for hit in select_hits(hits, model))
@@ -0,0 +1,207 @@
+import mmap
+import os
+import struct
+from collections.abc import Mapping, MutableMapping
+
+import numpy as np
+
+# =========================
+# FILE LAYOUT
+# =========================
+# header   MAGIC, n (u64), blob_len (u64)
+# blob     utf-8 texts back to back
+# ids      int64[n], sorted ascending
+# offsets  int64[n + 1] into the blob; text i = blob[offsets[i]:offsets[i + 1]]
+#
+# One file, replaced atomically, so readers never see ids and texts
+# from different writes.
+MAGIC = b"NDOCS\x00\x01\x00"
+_HEADER = struct.Struct("<8sQQ")
+
+
+def write_documents(path: str, documents: Mapping) -> None:
+    """
+    Stream `documents` (id -> text) into the mapped format at `path`.
+    """
+    ids = np.array(sorted(documents), dtype="int64")
+    offsets = np.zeros(len(ids) + 1, dtype="int64")
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, 0, 0))
+        pos = 0
+        for n, doc_id in enumerate(ids):
+            data = documents[int(doc_id)].encode("utf-8")
+            f.write(data)
+            pos += len(data)
+            offsets[n + 1] = pos
+        f.write(ids.tobytes())
+        f.write(offsets.tobytes())
+
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, len(ids), pos))
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp, path)
+
+
+class MappedDocuments(Mapping):
+    """
+    Read-only id -> text mapping over a memory-mapped documents file.
+
+    Every worker process maps the same file, so the corpus lives once in
+    the page cache; a lookup only touches the pages of the texts it reads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, n, blob_len = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise RuntimeError(f"{path} is not a documents file")
+
+        self._blob_start = _HEADER.size
+        arrays = self._blob_start + blob_len
+        self._ids = np.frombuffer(self._mm, dtype="int64", count=n, offset=arrays)
+        self._offsets = np.frombuffer(self._mm, dtype="int64", count=n + 1, offset=arrays + 8 * n)
+
+    def _position(self, doc_id) -> int:
+        pos = int(np.searchsorted(self._ids, doc_id))
+        if pos >= len(self._ids) or self._ids[pos] != doc_id:
+            return -1
+        return pos
+
+    def __getitem__(self, doc_id) -> str:
+        pos = self._position(doc_id)
+        if pos < 0:
+            raise KeyError(doc_id)
+        start = self._blob_start + int(self._offsets[pos])
+        end = self._blob_start + int(self._offsets[pos + 1])
+        return self._mm[start:end].decode("utf-8")
+
+    def __contains__(self, doc_id) -> bool:
+        return self._position(doc_id) >= 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids.tolist())
+
+
+# =========================
+# FULL-PRECISION VECTORS
+# =========================
+# header   VMAGIC, n (u64), dim (u64)
+# ids      int64[n], sorted ascending
+# rows     float32[n, dim], row i belongs to ids[i]
+VMAGIC = b"NVECS\x00\x01\x00"
+
+
+def write_vectors(path: str, vectors: Mapping, dim: int) -> None:
+    """
+    Stream `vectors` (id -> float32 row) into the mapped format at `path`.
+    """
+    ids = np.array(sorted(vectors), dtype="int64")
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(VMAGIC, len(ids), dim))
+        f.write(ids.tobytes())
+        for doc_id in ids:
+            f.write(np.asarray(vectors[int(doc_id)], dtype="float32").tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp, path)
+
+
+class MappedVectors(Mapping):
+    """
+    Read-only id -> float32 row mapping over a memory-mapped vectors file.
+    Used to rescore a handful of candidates at full precision, so only
+    their rows are ever paged in.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, n, dim = _HEADER.unpack_from(self._mm, 0)
+        if magic != VMAGIC:
+            raise RuntimeError(f"{path} is not a vectors file")
+
+        self.dim = dim
+        self._ids = np.frombuffer(self._mm, dtype="int64", count=n, offset=_HEADER.size)
+        self._rows = np.frombuffer(
+            self._mm, dtype="float32", count=n * dim, offset=_HEADER.size + 8 * n
+        ).reshape(n, dim)
+
+    def __getitem__(self, doc_id) -> np.ndarray:
+        pos = int(np.searchsorted(self._ids, doc_id))
+        if pos >= len(self._ids) or self._ids[pos] != doc_id:
+            raise KeyError(doc_id)
+        return self._rows[pos]
+
+    def __contains__(self, doc_id) -> bool:
+        pos = int(np.searchsorted(self._ids, doc_id))
+        return pos < len(self._ids) and self._ids[pos] == doc_id
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids.tolist())
+
+
+# =========================
+# WRITABLE OVERLAY
+# =========================
+class MappingOverlay(MutableMapping):
+    """
+    Writable view over a read-only base mapping (documents or vectors):
+    records additions and removals without copying the base into memory.
+    """
+
+    def __init__(self, base: Mapping):
+        self.base = base
+        self.added: dict = {}
+        self.removed: set[int] = set()
+
+    def __getitem__(self, doc_id):
+        if doc_id in self.added:
+            return self.added[doc_id]
+        if doc_id in self.removed:
+            raise KeyError(doc_id)
+        return self.base[doc_id]
+
+    def __setitem__(self, doc_id, text):
+        self.added[doc_id] = text
+
+    def __delitem__(self, doc_id):
+        if doc_id in self.added:
+            del self.added[doc_id]
+            if doc_id in self.base:
+                self.removed.add(doc_id)
+        elif doc_id in self.base and doc_id not in self.removed:
+            self.removed.add(doc_id)
+        else:
+            raise KeyError(doc_id)
+
+    def __contains__(self, doc_id) -> bool:
+        return doc_id in self.added or (doc_id not in self.removed and doc_id in self.base)
+
+    def __iter__(self):
+        for doc_id in self.base:
+            if doc_id not in self.removed and doc_id not in self.added:
+                yield doc_id
+        yield from self.added
+
+    def __len__(self) -> int:
+        # `removed` only ever holds base ids
+        extra = sum(1 for doc_id in self.added if doc_id not in self.base or doc_id in self.removed)
+        return len(self.base) - len(self.removed) + extra
@@ -0,0 +1,174 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from app.core.config import settings
+
+BASE_DIR = os.path.dirname(__file__)
+DEFAULT_CACHE_PATH = os.path.join(BASE_DIR, "data", "embedding_cache.sqlite3")
+
+# Hits only record `last_used` in memory; they are written with the next
+# put, or once the oldest pending touch is this many seconds old
+TOUCH_FLUSH_INTERVAL = 60.0
+
+
+def cache_key(model: str, text: str) -> str:
+    """
+    Content address for one embedding: model name + SHA-256 of the text.
+    """
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model}:{digest}"
+
+
+class EmbeddingCache:
+    """
+    Persistent, size-bounded LRU cache of embeddings.
+
+    Vectors are stored as raw float32 blobs in SQLite; `last_used` drives
+    eviction once more than `max_entries` rows are stored. The file may be
+    shared by several worker processes, so sizes are always read from it.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._touched: dict[str, float] = {}  # key -> last hit, not yet written
+        self._touched_since = None
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+
+    # ---------- read ----------
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        if not keys:
+            return {}
+
+        found = {}
+        with self._lock:
+            # SQLite caps bound parameters; stay well below the limit
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype="float32")
+
+            if found:
+                now = time.time()
+                self._touched.update(dict.fromkeys(found, now))
+                if self._touched_since is None:
+                    self._touched_since = now
+                elif now - self._touched_since >= TOUCH_FLUSH_INTERVAL:
+                    self._flush_touches()
+                    self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        return found
+
+    def get(self, key: str):
+        return self.get_many([key]).get(key)
+
+    # ---------- write ----------
+    def put_many(self, items: dict[str, np.ndarray]):
+        if not items:
+            return
+
+        now = time.time()
+        rows = [
+            (key, np.asarray(vector, dtype="float32").tobytes(), now)
+            for key, vector in items.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                rows,
+            )
+            self._flush_touches()
+            self._evict()
+            self._conn.commit()
+
+    def put(self, key: str, vector):
+        self.put_many({key: vector})
+
+    def _flush_touches(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()],
+            )
+            self._touched.clear()
+        self._touched_since = None
+
+    def _size(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _evict(self):
+        # Counted inside the write transaction: other processes' rows included
+        excess = self._size() - self.max_entries
+        if excess <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            " SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self.evictions += excess
+
+    # ---------- metrics ----------
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = self._size()
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """
+    Process-wide cache, opened lazily. Returns None when disabled.
+    """
+    global _cache
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(
+                    settings.EMBEDDING_CACHE_PATH or DEFAULT_CACHE_PATH,
+                    settings.EMBEDDING_CACHE_MAX_ENTRIES,
+                )
+    return _cache
@@ -1,42 +1,181 @@
 import hashlib
+import time
 import numpy as np
 import httpx
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    # tiktoken is optional; fall back to a character-based estimate
+    _encoding = None
 from app.core.config import settings
+from app.core.metrics import timed_stage
+from app.ai.embedding_cache import cache_key, get_embedding_cache
 
 DIM = 1536
+EMBEDDINGS_URL = "https://api.openai.com/v1/embeddings"
+
+
+def _mock_rng(text: str) -> np.random.Generator:
+    # Private generator per call: no shared global RNG state between threads
+    h = hashlib.sha256(text.encode()).digest()
+    return np.random.default_rng(int.from_bytes(h[:8], "little"))
 
 
-def mock_embedding(text: str):
+def mock_embedding(text: str) -> np.ndarray:
     """
-    Deterministic mock embedding for development.
+    Deterministic mock embedding for development (float32, shape (DIM,)).
     """
-    h = hashlib.sha256(text.encode()).digest()
-    np.random.seed(int.from_bytes(h[:4], "little"))
-    return np.random.rand(DIM).tolist()
+    return _mock_rng(text).random(DIM, dtype=np.float32)
 
 
-def embed_text(text: str):
-    # 🔥 THIS is the fix
-    if settings.EMBEDDING_MODE.lower() == "mock":
-        return mock_embedding(text)
+def mock_embed_batch(texts: list[str]) -> np.ndarray:
+    """
+    Bulk version of mock_embedding, same vectors row for row.
+    """
+    out = np.empty((len(texts), DIM), dtype="float32")
+    for i, text in enumerate(texts):
+        _mock_rng(text).random(dtype=np.float32, out=out[i])
+    return out
 
-    url = "https://api.openai.com/v1/embeddings"
 
-    headers = {
+def _headers():
+    return {
         "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
         "Content-Type": "application/json",
     }
 
+
+def count_tokens(text: str) -> int:
+    """
+    Tokens as the embedding model sees them (cl100k_base), or ~4 characters
+    per token when tiktoken is not installed.
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+# =========================
+# RATE LIMITS
+# =========================
+def _retry_after(response: httpx.Response, attempt: int) -> float:
+    """Seconds to wait: the server's Retry-After if it sent one, else exponential."""
+    try:
+        delay = float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        delay = 2.0 ** attempt
+    return min(max(delay, 0.0), settings.EMBEDDING_RETRY_MAX_DELAY)
+
+
+def _post(client: httpx.Client, payload: dict) -> httpx.Response:
+    """
+    POST to the embeddings API, waiting out 429s. Once retries are used up
+    the error is raised: a mock vector stored as a real one would never be
+    re-embedded.
+    """
+    for attempt in range(settings.EMBEDDING_MAX_RETRIES + 1):
+        response = client.post(EMBEDDINGS_URL, json=payload)
+        if response.status_code != 429 or attempt == settings.EMBEDDING_MAX_RETRIES:
+            break
+        time.sleep(_retry_after(response, attempt))
+    response.raise_for_status()
+    return response
+
+
+@timed_stage("embedding")
+def embed_text(text: str):
+    # 🔥 THIS is the fix
+    if settings.EMBEDDING_MODE.lower() == "mock":
+        return mock_embedding(text)
+
+    cache = get_embedding_cache()
+    key = cache_key(settings.EMBEDDING_MODEL, text)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached.tolist()
+
     payload = {
-        "model": "text-embedding-3-small",
+        "model": settings.EMBEDDING_MODEL,
         "input": text,
     }
 
-    response = httpx.post(url, headers=headers, json=payload, timeout=30)
+    with httpx.Client(headers=_headers(), timeout=30) as client:
+        response = _post(client, payload)
+    embedding = response.json()["data"][0]["embedding"]
 
-    if response.status_code == 429:
-        # graceful fallback
-        return mock_embedding(text)
+    if cache is not None:
+        cache.put(key, embedding)
+    return embedding
 
-    response.raise_for_status()
-    return response.json()["data"][0]["embedding"]
+
+# =========================
+# BATCH
+# =========================
+def _pack_batches(texts: list[str], batch_size: int, max_tokens: int):
+    """
+    Yield (start, end) slices of `texts` that stay within both the input
+    count and the approximate token budget of one embeddings request.
+    """
+    start = 0
+    tokens = 0
+    for i, text in enumerate(texts):
+        cost = count_tokens(text)
+        if i > start and (i - start >= batch_size or tokens + cost > max_tokens):
+            yield start, i
+            start, tokens = i, 0
+        tokens += cost
+    if start < len(texts):
+        yield start, len(texts)
+
+
+def _request_batch(client: httpx.Client, texts: list[str]) -> np.ndarray:
+    response = _post(client, {"model": settings.EMBEDDING_MODEL, "input": texts})
+    data = sorted(response.json()["data"], key=lambda d: d["index"])
+    return np.array([d["embedding"] for d in data], dtype="float32")
+
+
+@timed_stage("embedding")
+def embed_batch(
+    texts: list[str],
+    batch_size: int | None = None,
+    max_tokens: int | None = None,
+) -> np.ndarray:
+    """
+    Embed many texts with as few requests as possible.
+    Returns a float32 array of shape (len(texts), DIM), rows in input order.
+    """
+    if not texts:
+        return np.empty((0, DIM), dtype="float32")
+
+    if settings.EMBEDDING_MODE.lower() == "mock":
+        return mock_embed_batch(texts)
+
+    batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+    max_tokens = max_tokens or settings.EMBEDDING_BATCH_MAX_TOKENS
+
+    out = np.empty((len(texts), DIM), dtype="float32")
+
+    # Serve what we can from the cache; only unseen texts hit the API
+    cache = get_embedding_cache()
+    keys = [cache_key(settings.EMBEDDING_MODEL, text) for text in texts]
+    cached = cache.get_many(list(set(keys))) if cache is not None else {}
+
+    missing = [i for i, key in enumerate(keys) if key not in cached]
+    for i, key in enumerate(keys):
+        if key in cached:
+            out[i] = cached[key]
+
+    if missing:
+        pending = [texts[i] for i in missing]
+        with httpx.Client(headers=_headers(), timeout=60) as client:
+            for start, end in _pack_batches(pending, batch_size, max_tokens):
+                rows = missing[start:end]
+                out[rows] = _request_batch(client, pending[start:end])
+
+                if cache is not None:
+                    cache.put_many({keys[i]: out[i] for i in rows})
+
+    return out
@@ -0,0 +1,345 @@
+import faiss
+import numpy as np
+
+from app.core.config import settings
+
+# =========================
+# INDEX KINDS
+# =========================
+# flat      exact brute force (IndexIDMap2 over IndexFlatL2)
+# ivf_flat  inverted lists, full vectors; tune with nprobe
+# ivf_pq    inverted lists, product-quantized vectors; tune with nprobe
+# hnsw      graph index; tune with efSearch (removals rebuild the graph)
+INDEX_KINDS = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+TRAINED_KINDS = ("ivf_flat", "ivf_pq")
+
+# Per-vector storage for flat / ivf_flat / hnsw (ivf_pq always stores "pq" codes)
+# float32   4 bytes per dim, exact
+# float16   2 bytes per dim
+# sq8       1 byte per dim, per-dimension 8-bit scalar quantizer (trained)
+STORAGE_KINDS = ("float32", "float16", "sq8")
+_QTYPES = {
+    "float16": faiss.ScalarQuantizer.QT_fp16,
+    "sq8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+
+def _inner(index):
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def index_kind(index) -> str:
+    inner = _inner(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def configured_kind() -> str:
+    kind = settings.INDEX_TYPE.lower()
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Unknown INDEX_TYPE {settings.INDEX_TYPE!r}; expected one of {INDEX_KINDS}")
+    return kind
+
+
+def target_kind(n_vectors: int) -> str:
+    """
+    Configured kind, except that IVF variants stay flat until there is
+    enough data to train them meaningfully.
+    """
+    kind = configured_kind()
+    if kind in TRAINED_KINDS and n_vectors < settings.INDEX_MIN_TRAIN:
+        return "flat"
+    return kind
+
+
+def supports_remove(index) -> bool:
+    return index_kind(index) != "hnsw"
+
+
+def index_storage(index) -> str:
+    inner = _inner(index)
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "pq"
+    if isinstance(inner, faiss.IndexHNSW):
+        inner = faiss.downcast_index(inner.storage)
+    if isinstance(inner, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        for storage, qtype in _QTYPES.items():
+            if inner.sq.qtype == qtype:
+                return storage
+        return "sq"
+    return "float32"
+
+
+def configured_storage() -> str:
+    storage = settings.VECTOR_STORAGE.lower()
+    if storage not in STORAGE_KINDS:
+        raise ValueError(f"Unknown VECTOR_STORAGE {settings.VECTOR_STORAGE!r}; expected one of {STORAGE_KINDS}")
+    return storage
+
+
+def configured_dims(dim: int) -> int:
+    dims = settings.VECTOR_DIMS or dim
+    if not 0 < dims <= dim:
+        raise ValueError(f"VECTOR_DIMS must be between 1 and {dim}, got {settings.VECTOR_DIMS}")
+    return dims
+
+
+# =========================
+# LAYOUT
+# =========================
+# (kind, storage, dims) fully describes how vectors sit in an index; a
+# writer rebuilds whenever the resident layout differs from the target.
+def layout(index) -> tuple[str, str, int]:
+    return index_kind(index), index_storage(index), index.d
+
+
+def target_layout(n_vectors: int, dim: int) -> tuple[str, str, int]:
+    """
+    Configured layout for a corpus of `n_vectors`. An empty store is plain
+    flat float32: there is nothing to train a quantizer on yet.
+    """
+    if n_vectors == 0:
+        return "flat", "float32", dim
+    kind = target_kind(n_vectors)
+    storage = "pq" if kind == "ivf_pq" else configured_storage()
+    return kind, storage, configured_dims(dim)
+
+
+def is_compact(index, dim: int) -> bool:
+    """
+    True when the index holds lossy or truncated vectors, so results are
+    worth rescoring against the full-precision ones.
+    """
+    _, storage, dims = layout(index)
+    return storage != "float32" or dims < dim
+
+
+def keeps_full_vectors(dim: int) -> bool:
+    """
+    Whether the configured layout needs full float32 vectors kept on the
+    side (for rescoring, and for rebuilding without a lossy round trip).
+    """
+    return (
+        configured_storage() != "float32"
+        or configured_dims(dim) < dim
+        or configured_kind() == "ivf_pq"
+    )
+
+
+def project(vectors: np.ndarray, dims: int) -> np.ndarray:
+    """
+    Keep the first `dims` components and L2-renormalise them.
+    text-embedding-3 models are trained so that such prefixes
+    (Matryoshka representations) remain usable embeddings.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    if vectors.shape[1] <= dims:
+        return vectors
+    prefix = vectors[:, :dims]
+    norms = np.linalg.norm(prefix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(prefix / norms, dtype="float32")
+
+
+# =========================
+# BUILD
+# =========================
+def _training_sample(train_vectors: np.ndarray | None) -> np.ndarray | None:
+    if train_vectors is None or not len(train_vectors):
+        return None
+    n = len(train_vectors)
+    if n > settings.INDEX_TRAIN_SIZE:
+        sample = np.random.default_rng(0).choice(n, settings.INDEX_TRAIN_SIZE, replace=False)
+        train_vectors = train_vectors[sample]
+    return np.ascontiguousarray(train_vectors, dtype="float32")
+
+
+def build_index(kind: str, dim: int, train_vectors: np.ndarray | None = None, storage: str = "float32"):
+    """
+    Empty, trained index of the given kind and vector storage. Trained
+    parts (IVF centroids, sq8 ranges) use a random sample of at most
+    INDEX_TRAIN_SIZE rows of `train_vectors`.
+    """
+    train_vectors = _training_sample(train_vectors)
+    qtype = _QTYPES.get(storage)
+
+    if kind == "flat":
+        if qtype is None:
+            index = faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+        else:
+            index = faiss.IndexIDMap2(faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_L2))
+
+    elif kind == "hnsw":
+        if qtype is None:
+            hnsw = faiss.IndexHNSWFlat(dim, settings.INDEX_HNSW_M)
+        else:
+            hnsw = faiss.IndexHNSWSQ(dim, qtype, settings.INDEX_HNSW_M)
+        hnsw.hnsw.efConstruction = settings.INDEX_EF_CONSTRUCTION
+        index = faiss.IndexIDMap2(hnsw)
+
+    else:
+        assert train_vectors is not None, f"{kind} needs training vectors"
+
+        # FAISS wants ~39 training points per centroid
+        nlist = max(1, min(settings.INDEX_NLIST, len(train_vectors) // 39))
+
+        quantizer = faiss.IndexFlatL2(dim)
+        if kind == "ivf_pq":
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, settings.INDEX_PQ_M, settings.INDEX_PQ_NBITS)
+        elif qtype is None:
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, qtype, faiss.METRIC_L2)
+
+        # IVF indexes store our ids natively; the hashtable keeps reconstruct()
+        # and remove_ids() working
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        index.nprobe = settings.INDEX_NPROBE
+
+    if not index.is_trained:
+        assert train_vectors is not None, f"{kind}/{storage} needs training vectors"
+        index.train(train_vectors)
+    return index
+
+
+def reconstruct_all(index, ids) -> np.ndarray:
+    """
+    Stored vectors for `ids` (lossy / truncated for compact layouts).
+    """
+    ids = list(ids)
+    if not ids:
+        return np.empty((0, index.d), dtype="float32")
+    return np.stack([index.reconstruct(int(i)) for i in ids]).astype("float32")
+
+
+# =========================
+# SEARCH
+# =========================
+# Filters allowing at most this many ids are scanned exactly instead of
+# searched through the index (graph / list traversal degrades when most
+# neighbours are filtered out)
+EXACT_FILTER_MAX = 2048
+
+
+def search_params(index, nprobe: int | None = None, ef_search: int | None = None, sel=None):
+    """
+    Per-query tuning knobs; None means the configured default.
+    `sel` is an optional faiss.IDSelector restricting the searched ids.
+    """
+    kind = index_kind(index)
+    if kind in TRAINED_KINDS:
+        return faiss.SearchParametersIVF(nprobe=nprobe or settings.INDEX_NPROBE, sel=sel)
+    if kind == "hnsw":
+        return faiss.SearchParametersHNSW(efSearch=ef_search or settings.INDEX_EF_SEARCH, sel=sel)
+    if sel is not None:
+        return faiss.SearchParameters(sel=sel)
+    return None
+
+
+def _scan(index, query_vectors: np.ndarray, k: int, allowed: np.ndarray, full=None):
+    """
+    Exact top-k over the `allowed` ids only, at full precision when
+    `full` is given.
+    """
+    if full is not None:
+        allowed = np.array([i for i in allowed if i in full], dtype="int64")
+        rows = np.stack([full[int(i)] for i in allowed]) if len(allowed) else None
+    else:
+        rows = reconstruct_all(index, allowed)
+        query_vectors = project(query_vectors, index.d)
+
+    if rows is None or not len(rows):
+        return (
+            np.full((len(query_vectors), k), np.inf, dtype="float32"),
+            np.full((len(query_vectors), k), -1, dtype="int64"),
+        )
+
+    distances, positions = faiss.knn(query_vectors, np.ascontiguousarray(rows, dtype="float32"), min(k, len(rows)))
+    ids = np.where(positions >= 0, allowed[np.maximum(positions, 0)], -1)
+    if ids.shape[1] < k:
+        pad = k - ids.shape[1]
+        distances = np.pad(distances, ((0, 0), (0, pad)), constant_values=np.inf)
+        ids = np.pad(ids, ((0, 0), (0, pad)), constant_values=-1)
+    return distances, ids
+
+
+def _rescore(query_vectors: np.ndarray, candidates: np.ndarray, k: int, full):
+    """
+    Re-rank candidate ids by exact L2 distance to their full-precision
+    vectors (`full`: id -> float32 row). Ids missing from `full` are dropped.
+    """
+    distances = np.full((len(candidates), k), np.inf, dtype="float32")
+    ids = np.full((len(candidates), k), -1, dtype="int64")
+
+    for n, (query, row) in enumerate(zip(query_vectors, candidates)):
+        row = [int(i) for i in row if i >= 0 and i in full]
+        if not row:
+            continue
+        exact = ((np.stack([full[i] for i in row]) - query) ** 2).sum(axis=1)
+        order = np.argsort(exact)[:k]
+        distances[n, :len(order)] = exact[order]
+        ids[n, :len(order)] = np.asarray(row, dtype="int64")[order]
+
+    return distances, ids
+
+
+def search(index, query_vectors: np.ndarray, k: int, nprobe: int | None = None,
+           ef_search: int | None = None, full=None, allowed: np.ndarray | None = None):
+    """
+    Top-k (distances, ids) for full-width query vectors. Queries are
+    projected to the index width; with `full` (id -> float32 row), the
+    index returns k * VECTOR_RESCORE_FACTOR candidates that are re-ranked
+    at full precision. `allowed` (sorted int64 ids) restricts the search
+    to a metadata-filtered subset.
+    """
+    query_vectors = np.ascontiguousarray(query_vectors, dtype="float32")
+    if allowed is not None and len(allowed) <= EXACT_FILTER_MAX:
+        return _scan(index, query_vectors, k, allowed, full)
+
+    queries = project(query_vectors, index.d)
+    n_candidates = k if full is None else k * max(1, settings.VECTOR_RESCORE_FACTOR)
+
+    # Keep the selector referenced for the duration of the search
+    sel = faiss.IDSelectorBatch(allowed) if allowed is not None else None
+    params = search_params(index, nprobe, ef_search, sel)
+    if params is None:
+        distances, ids = index.search(queries, n_candidates)
+    else:
+        distances, ids = index.search(queries, n_candidates, params=params)
+
+    if full is None:
+        return distances, ids
+    return _rescore(query_vectors, ids, k, full)
+
+
+def recall_at_k(index, vectors: np.ndarray, ids, k: int = 10, n_queries: int = 200,
+                nprobe: int | None = None, ef_search: int | None = None, full=None) -> float:
+    """
+    Fraction of the exact top-k (flat search over the full-precision
+    `vectors`) that `index` also returns, using a sample of the stored
+    vectors as queries. Pass `full` to measure recall after rescoring.
+    """
+    n = len(vectors)
+    if n == 0:
+        return 1.0
+    k = min(k, n)
+    ids = np.asarray(list(ids), dtype="int64")
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+
+    rows = np.random.default_rng(0).choice(n, min(n_queries, n), replace=False)
+    queries = vectors[rows]
+
+    _, truth = exact.search(queries, k)
+    _, found = search(index, queries, k, nprobe, ef_search, full)
+
+    hits = sum(len(set(ids[t]) & set(f)) for t, f in zip(truth, found))
+    return hits / (len(rows) * k)
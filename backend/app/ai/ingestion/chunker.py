@@ -1,11 +1,110 @@
-def chunk_text(text: str, chunk_size=500, overlap=100):
-    chunks = []
-    start = 0
+import re
+from typing import Iterator, NamedTuple
 
-    while start < len(text):
-        end = start + chunk_size
-        chunk = text[start:end]
-        chunks.append(chunk)
-        start += chunk_size - overlap
+from app.ai.embeddings import count_tokens
+from app.core.config import settings
 
-    return chunks
+_SECTION_BREAK = re.compile(r"\n\s*\n")         # blank line between sections
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?;:])\s+")
+_WORD = re.compile(r"\S+")
+
+
+class Chunk(NamedTuple):
+    text: str
+    start: int   # character offsets into the source text
+    end: int
+    tokens: int
+
+
+def _spans(text: str, pattern: re.Pattern, start: int, end: int):
+    """
+    Split text[start:end] on `pattern`, yielding (start, end) of non-blank pieces.
+    """
+    pos = start
+    for m in pattern.finditer(text, start, end):
+        if text[pos:m.start()].strip():
+            yield pos, m.start()
+        pos = m.end()
+    if text[pos:end].strip():
+        yield pos, end
+
+
+def _units(text: str, max_tokens: int):
+    """
+    Yield (start, end, tokens, new_section) sentence-sized units.
+    Sentences longer than max_tokens are cut on word boundaries.
+    """
+    for section_start, section_end in _spans(text, _SECTION_BREAK, 0, len(text)):
+        new_section = True
+        for start, end in _spans(text, _SENTENCE_BREAK, section_start, section_end):
+            tokens = count_tokens(text[start:end])
+            if tokens <= max_tokens:
+                yield start, end, tokens, new_section
+                new_section = False
+                continue
+
+            # Oversized sentence: pack words instead
+            piece_start = piece_end = None
+            piece_tokens = 0
+            for word in _WORD.finditer(text, start, end):
+                word_tokens = count_tokens(word.group()) + 1
+                if piece_start is not None and piece_tokens + word_tokens > max_tokens:
+                    yield piece_start, piece_end, piece_tokens, new_section
+                    new_section = False
+                    piece_start, piece_tokens = None, 0
+                if piece_start is None:
+                    piece_start = word.start()
+                piece_end = word.end()
+                piece_tokens += word_tokens
+            if piece_start is not None:
+                yield piece_start, piece_end, piece_tokens, new_section
+                new_section = False
+
+
+def iter_chunks(
+    text: str,
+    max_tokens: int | None = None,
+    overlap_tokens: int | None = None,
+) -> Iterator[Chunk]:
+    """
+    Lazily split `text` into chunks of at most `max_tokens` tokens.
+
+    Chunks end on sentence boundaries, and a new section (blank line) starts
+    a new chunk once the current one is at least half full. Consecutive
+    chunks share up to `overlap_tokens` of trailing sentences.
+    """
+    max_tokens = max_tokens or settings.CHUNK_MAX_TOKENS
+    overlap_tokens = settings.CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+
+    window = []  # (start, end, tokens) of units in the current chunk
+    total = 0
+
+    def emit():
+        start, end = window[0][0], window[-1][1]
+        return Chunk(text[start:end], start, end, total)
+
+    for start, end, tokens, new_section in _units(text, max_tokens):
+        full = total + tokens > max_tokens
+        section_flush = new_section and total >= max_tokens // 2
+        if window and (full or section_flush):
+            yield emit()
+
+            # Carry trailing sentences forward as overlap (never across sections)
+            carried, carried_tokens = [], 0
+            if not new_section:
+                for unit in reversed(window):
+                    if carried_tokens + unit[2] > overlap_tokens or carried_tokens + unit[2] + tokens > max_tokens:
+                        break
+                    carried.insert(0, unit)
+                    carried_tokens += unit[2]
+            window, total = carried, carried_tokens
+
+        window.append((start, end, tokens))
+        total += tokens
+
+    if window:
+        yield emit()
+
+
+def chunk_text(text: str, max_tokens: int | None = None, overlap_tokens: int | None = None) -> list[str]:
+    return [chunk.text for chunk in iter_chunks(text, max_tokens, overlap_tokens)]
@@ -1,30 +1,184 @@
+import json
 import os
-from app.ai.embeddings import embed_text
-from app.ai.vector_store import add_documents
+from app.ai import index_types
+from app.ai.embeddings import embed_batch
+from app.ai.ingestion.chunker import iter_chunks
+from app.ai.ingestion.loader import SUPPORTED_SUFFIXES, file_hash, iter_pages
+from app.ai.namespaces import GENERAL_JURISDICTION, NAMESPACES_DIR, get_store
+from app.ai.vector_store import DATA_DIR as STORE_DIR, store
+from app.core.config import settings
 
 BASE_DIR = os.path.dirname(__file__)
 DATA_DIR = os.path.join(BASE_DIR, "..", "data")
+MANIFEST_PATH = os.path.join(STORE_DIR, "manifest.json")
 
 
+# =========================
+# MANIFEST
+# =========================
+# { "<path relative to data/>": {"hash": "<sha256 of file bytes>",
+#                   "ids": [<vector id per chunk>],
+#                   "pages": [<1-based page per chunk>],
+#                   "offsets": [[start, end] within that page, per chunk]} }
+def load_manifest(path: str = MANIFEST_PATH):
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict, path: str = MANIFEST_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def scan_documents(data_dir: str = DATA_DIR) -> dict:
+    """
+    {relative path: file hash} for every non-empty PDF/text file in data_dir
+    and in its jurisdiction subdirectories (data/<jurisdiction>/<file>).
+    Contents are not kept; changed files are re-read when chunked.
+    """
+    found = {}
+    for entry in sorted(os.listdir(data_dir)):
+        path = os.path.join(data_dir, entry)
+        if os.path.isdir(path):
+            if os.path.abspath(path) == os.path.abspath(NAMESPACES_DIR):
+                continue
+            names = [os.path.join(entry, filename) for filename in sorted(os.listdir(path))]
+        else:
+            names = [entry]
+
+        for name in names:
+            path = os.path.join(data_dir, name)
+            if not name.endswith(SUPPORTED_SUFFIXES) or not os.path.isfile(path) or os.path.getsize(path) == 0:
+                continue
+            found[name] = file_hash(path)
+    return found
+
+
+def chunk_metadata(name: str, page: int) -> dict:
+    """
+    Metadata stored with every chunk of a global document: the
+    subdirectory is its jurisdiction, the file stem its document type.
+    """
+    folder, filename = os.path.split(name)
+    return {
+        "source": name,
+        "page": page,
+        "doc_type": os.path.splitext(filename)[0],
+        "jurisdiction": folder or GENERAL_JURISDICTION,
+    }
+
+
+def iter_file_chunks(names: list[str], data_dir: str = DATA_DIR):
+    """
+    Stream (relative path, page, Chunk) triples. PDF pages are extracted in
+    parallel by the loader and chunked as they arrive.
+    """
+    paths = [os.path.join(data_dir, name) for name in names]
+    for record in iter_pages(paths):
+        name = os.path.relpath(record.source, data_dir)
+        for chunk in iter_chunks(record.text):
+            yield name, record.page, chunk
+
+
+def iter_batches(items, size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# =========================
+# INGEST
+# =========================
 def ingest_documents():
-    texts = []
-    vectors = []
+    """
+    Incremental, streaming ingest: file -> chunks -> embedding batches -> index.
+
+    Only new or changed files are embedded, vectors of changed or deleted
+    files are removed, unchanged files are left alone.
+    """
+    current = scan_documents()
+    manifest = load_manifest()
+
+    remove_ids = []
+    snap = store.snapshot()
+    if manifest is None or (len(snap.documents) and not len(snap.metadata)):
+        # No manifest (or chunks without metadata) yet: we can't tell what
+        # the index holds, so rebuild
+        manifest = {}
+        remove_ids = list(snap.documents)
+
+    changed = [
+        name for name, digest in current.items()
+        if name not in manifest or manifest[name]["hash"] != digest
+    ]
+    gone = [name for name in manifest if name not in current]
+
+    for name in gone + changed:
+        if name in manifest:
+            remove_ids.extend(manifest.pop(name)["ids"])
+
+    if not changed and not remove_ids and store.keywords.count() == len(snap.documents):
+        print(f"Ingest: {len(current)} documents unchanged")
+        return
+
+    for name in changed:
+        manifest[name] = {"hash": current[name], "ids": [], "pages": [], "offsets": []}
+
+    chunks = 0
+    with store.writer() as writer:
+        writer.remove(remove_ids)
+
+        # One embeddings request per batch instead of one per chunk
+        for batch in iter_batches(iter_file_chunks(changed), settings.EMBEDDING_BATCH_SIZE):
+            texts = [chunk.text for _, _, chunk in batch]
+            metadata = [chunk_metadata(name, page) for name, page, _ in batch]
+            ids = writer.add(texts, embed_batch(texts), metadata)
+
+            for (name, page, chunk), vector_id in zip(batch, ids):
+                manifest[name]["ids"].append(vector_id)
+                manifest[name]["pages"].append(page)
+                manifest[name]["offsets"].append([chunk.start, chunk.end])
+            chunks += len(batch)
+
+    save_manifest(manifest)
 
-    for filename in os.listdir(DATA_DIR):
-        if not filename.endswith(".txt"):
-            continue
+    if writer.recall is not None:
+        kind, storage, dims = index_types.layout(writer.index)
+        print(
+            f"Ingest: rebuilt {kind} index ({storage}, {dims} dims), recall@10 vs exact = "
+            f"{writer.recall_raw:.3f} raw, {writer.recall:.3f} rescored"
+        )
+    print(
+        f"Ingest: {len(changed)} files ({chunks} chunks) embedded, {len(gone)} deleted, "
+        f"{len(current) - len(changed)} unchanged, {len(remove_ids)} vectors removed"
+    )
 
-        path = os.path.join(DATA_DIR, filename)
-        with open(path, "r", encoding="utf-8") as f:
-            content = f.read().strip()
 
-        if content:
-            texts.append(content)
-            vectors.append(embed_text(content))
+def ingest_text(namespace: str, name: str, text: str, metadata: dict | None = None) -> int:
+    """
+    Chunk, embed and store one uploaded text in `namespace`, replacing any
+    earlier upload with the same name. Returns the number of chunks.
+    """
+    target = get_store(namespace)
+    chunks = list(iter_chunks(text))
 
-    add_documents(texts, vectors)
-    print(f"Ingested {len(texts)} documents",len(vectors[0]))
+    with target.writer() as writer:
+        writer.remove(target.find_ids({"source": name}))
+        for batch in iter_batches(chunks, settings.EMBEDDING_BATCH_SIZE):
+            texts = [chunk.text for chunk in batch]
+            writer.add(texts, embed_batch(texts), [dict(metadata or {}, source=name, page=1) for _ in batch])
 
+    return len(chunks)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,107 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Iterable, Mapping
+
+import numpy as np
+
+# Words and clause numbers: "IBC 1011.5" -> ["ibc", "1011.5"], while
+# sentence punctuation ("meters.") is dropped
+_TOKEN = re.compile(r"[^\W_]+(?:[.\-][^\W_]+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class KeywordIndex:
+    """
+    BM25 keyword index over chunk texts, keyed by vector id.
+
+    Backed by an SQLite FTS5 table next to the FAISS index. Texts are
+    stored pre-tokenized, and FTS5 keeps "." and "-" inside tokens, so
+    clause numbers match as whole terms.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        # Caller holds the lock
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5("
+                " body, tokenize=\"unicode61 tokenchars '.-'\")"
+            )
+            self._conn.commit()
+        return self._conn
+
+    # ---------- write ----------
+    def apply(self, added: Mapping, removed: Iterable[int]) -> None:
+        """
+        Index `added` (id -> text) and drop `removed` ids in one transaction.
+        """
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                self._delete(conn, list(removed) + list(added))
+                self._insert(conn, added)
+
+    def rebuild(self, documents: Mapping) -> None:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM chunks")
+                self._insert(conn, documents)
+
+    @staticmethod
+    def _delete(conn, ids: list[int]):
+        # SQLite caps bound parameters; stay well below the limit
+        for i in range(0, len(ids), 500):
+            chunk = [int(doc_id) for doc_id in ids[i:i + 500]]
+            marks = ",".join("?" * len(chunk))
+            conn.execute(f"DELETE FROM chunks WHERE rowid IN ({marks})", chunk)
+
+    @staticmethod
+    def _insert(conn, documents: Mapping):
+        conn.executemany(
+            "INSERT INTO chunks (rowid, body) VALUES (?, ?)",
+            ((int(doc_id), " ".join(tokenize(documents[doc_id]))) for doc_id in documents),
+        )
+
+    # ---------- read ----------
+    def count(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def search(self, query: str, k: int, allowed: np.ndarray | None = None) -> list[tuple[int, float]]:
+        """
+        Top-k (id, BM25 score) for any of the query's terms, best first.
+        `allowed` (ids) restricts the match to a metadata-filtered subset.
+        """
+        terms = dict.fromkeys(tokenize(query))
+        if not terms or k <= 0 or not os.path.exists(self.path):
+            return []
+
+        match = " OR ".join(f'"{term}"' for term in terms)
+        sql = "SELECT rowid, bm25(chunks) FROM chunks WHERE chunks MATCH ?"
+        params: list = [match]
+        if allowed is not None:
+            sql += " AND rowid IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps([int(i) for i in allowed]))
+        sql += " ORDER BY bm25(chunks) LIMIT ?"
+        params.append(k)
+
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+        # FTS5 reports BM25 negated (lower is better)
+        return [(int(doc_id), -float(rank)) for doc_id, rank in rows]
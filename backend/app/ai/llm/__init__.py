@@ -1 +1 @@
-from .generate import generate_answer
+from .generate import generate_answer, agenerate_answer, astream_answer
@@ -1,17 +1,71 @@
-from openai import OpenAI
+import re
+import threading
+
+import httpx
+from openai import OpenAI, AsyncOpenAI
 from app.core.config import settings
+from app.core.concurrency import limiter
 
-def generate_answer(query: str, context: str = "", system_prompt: str = "") -> str:
+# =========================
+# SHARED CLIENTS
+# =========================
+# Built once per process so every call reuses pooled keep-alive connections
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(settings.LLM_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT)
 
-    if settings.LLM_MODE == "mock":
-        return (
-            "[MOCK LLM RESPONSE]\n\n"
-            f"Question:\n{query}\n\n"
-            f"Context:\n{context[:600]}"
-        )
 
-    client = OpenAI(api_key=settings.OPENAI_API_KEY)
+def get_client() -> OpenAI:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OpenAI(
+                    api_key=settings.OPENAI_API_KEY,
+                    max_retries=settings.LLM_MAX_RETRIES,
+                    timeout=_timeout(),
+                    http_client=httpx.Client(limits=_limits(), timeout=_timeout()),
+                )
+    return _client
 
+
+def get_async_client() -> AsyncOpenAI:
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncOpenAI(
+                    api_key=settings.OPENAI_API_KEY,
+                    max_retries=settings.LLM_MAX_RETRIES,
+                    timeout=_timeout(),
+                    http_client=httpx.AsyncClient(limits=_limits(), timeout=_timeout()),
+                )
+    return _async_client
+
+
+# =========================
+# HELPERS
+# =========================
+def _mock_answer(query: str, context: str) -> str:
+    return (
+        "[MOCK LLM RESPONSE]\n\n"
+        f"Question:\n{query}\n\n"
+        f"Context:\n{context[:600]}"
+    )
+
+
+def _build_messages(query: str, context: str, system_prompt: str) -> list[dict]:
     messages = []
 
     if system_prompt:
@@ -21,12 +75,65 @@ def generate_answer(query: str, context: str = "", system_prompt: str = "") -> s
         messages.append({"role": "system", "content": f"Context:\n{context}"})
 
     messages.append({"role": "user", "content": query})
+    return messages
 
-    response = client.chat.completions.create(
+
+# =========================
+# GENERATE
+# =========================
+def generate_answer(query: str, context: str = "", system_prompt: str = "") -> str:
+
+    if settings.LLM_MODE == "mock":
+        return _mock_answer(query, context)
+
+    response = get_client().chat.completions.create(
         model=settings.AI_MODEL,
-        messages=messages,
+        messages=_build_messages(query, context, system_prompt),
         temperature=settings.AI_TEMPERATURE,
         max_tokens=settings.AI_MAX_TOKENS,
     )
 
     return response.choices[0].message.content
+
+
+async def agenerate_answer(query: str, context: str = "", system_prompt: str = "") -> str:
+    """
+    Non-blocking generate_answer for async endpoints.
+    """
+    if settings.LLM_MODE == "mock":
+        return _mock_answer(query, context)
+
+    async with limiter("llm"):
+        response = await get_async_client().chat.completions.create(
+            model=settings.AI_MODEL,
+            messages=_build_messages(query, context, system_prompt),
+            temperature=settings.AI_TEMPERATURE,
+            max_tokens=settings.AI_MAX_TOKENS,
+        )
+
+    return response.choices[0].message.content
+
+
+async def astream_answer(query: str, context: str = "", system_prompt: str = ""):
+    """
+    Yield the answer as text deltas as soon as the model produces them.
+    """
+    if settings.LLM_MODE == "mock":
+        for piece in re.split(r"(\s+)", _mock_answer(query, context)):
+            if piece:
+                yield piece
+        return
+
+    # The slot is held for the whole stream, not just the first byte
+    async with limiter("llm"):
+        stream = await get_async_client().chat.completions.create(
+            model=settings.AI_MODEL,
+            messages=_build_messages(query, context, system_prompt),
+            temperature=settings.AI_TEMPERATURE,
+            max_tokens=settings.AI_MAX_TOKENS,
+            stream=True,
+        )
+
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
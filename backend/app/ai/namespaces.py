@@ -0,0 +1,118 @@
+import os
+import re
+import shutil
+import threading
+
+import numpy as np
+
+from app.ai import vector_store
+from app.ai.vector_store import Hit, VectorStore
+
+# =========================
+# NAMESPACES
+# =========================
+# Each namespace is its own partition: index, documents, metadata (and
+# full vectors) under its own directory, loaded and reloaded on its own.
+#
+# global         shared building codes / guidelines (data/ at the top level,
+#                kept where older versions wrote it)
+# project-<id>   documents uploaded to one project
+GLOBAL = "global"
+GENERAL_JURISDICTION = "general"   # chunks that apply everywhere
+NAMESPACES_DIR = os.path.join(vector_store.DATA_DIR, "namespaces")
+
+_NAME = re.compile(r"^[a-z0-9][a-z0-9_-]*$")
+
+_stores: dict[str, VectorStore] = {GLOBAL: vector_store.store}
+_lock = threading.Lock()
+
+
+def project_namespace(project_id: int) -> str:
+    return f"project-{int(project_id)}"
+
+
+def _namespace_dir(namespace: str) -> str:
+    if not _NAME.match(namespace):
+        raise ValueError(f"Invalid namespace {namespace!r}")
+    return os.path.join(NAMESPACES_DIR, namespace)
+
+
+def get_store(namespace: str = GLOBAL) -> VectorStore:
+    """
+    Resident store for `namespace`, opened on first use. Namespaces that
+    were never written behave as empty stores.
+    """
+    store = _stores.get(namespace)
+    if store is not None:
+        return store
+
+    directory = _namespace_dir(namespace)
+    with _lock:
+        store = _stores.get(namespace)
+        if store is None:
+            store = VectorStore(
+                os.path.join(directory, "faiss.index"),
+                os.path.join(directory, "documents.bin"),
+            )
+            _stores[namespace] = store
+    return store
+
+
+def drop_namespace(namespace: str) -> None:
+    """Delete a namespace's files and forget its resident store."""
+    if namespace == GLOBAL:
+        raise ValueError("The global namespace can't be dropped")
+
+    directory = _namespace_dir(namespace)
+    with _lock:
+        _stores.pop(namespace, None)
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def generation() -> int:
+    """
+    Changes whenever any opened namespace reloads (every store's
+    generation only ever grows, so the sum does too).
+    """
+    return sum(store.generation for store in list(_stores.values()))
+
+
+# =========================
+# SEARCH
+# =========================
+def _where(namespace: str, where: dict | None) -> dict | None:
+    # Filters narrow the shared codes; a project namespace only holds that
+    # project's own uploads, which stay relevant whatever their metadata
+    return where if namespace == GLOBAL else None
+
+
+def search(query_vectors, top_k: int = 3, namespaces: list[str] | None = None,
+           where: dict | None = None) -> list[list[Hit]]:
+    """
+    Search only the given namespaces (default: global) and merge their
+    hits per query row by distance. `where` filters on chunk metadata
+    within the global namespace.
+    """
+    query_vectors = np.atleast_2d(np.asarray(query_vectors, dtype="float32"))
+    merged: list[list[Hit]] = [[] for _ in range(len(query_vectors))]
+
+    for namespace in dict.fromkeys(namespaces or [GLOBAL]):
+        rows = get_store(namespace).search_hits(query_vectors, top_k, _where(namespace, where))
+        for hits, row in zip(merged, rows):
+            hits.extend(hit._replace(namespace=namespace) for hit in row)
+
+    return [sorted(hits, key=lambda hit: hit.distance)[:top_k] for hits in merged]
+
+
+def keyword_search(query: str, top_k: int = 3, namespaces: list[str] | None = None,
+                   where: dict | None = None) -> list[Hit]:
+    """
+    BM25 counterpart of search() for one query text, merged by score.
+    """
+    hits: list[Hit] = []
+    for namespace in dict.fromkeys(namespaces or [GLOBAL]):
+        hits.extend(
+            hit._replace(namespace=namespace)
+            for hit in get_store(namespace).keyword_hits(query, top_k, _where(namespace, where))
+        )
+    return sorted(hits, key=lambda hit: -hit.score)[:top_k]
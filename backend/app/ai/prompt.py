@@ -1,3 +1,5 @@
+from app.ai.context_builder import SEPARATOR, select_texts
+
 SYSTEM_PROMPT = """
 You are an Architectural Design Assistant.
 Use ONLY the provided context.
@@ -5,7 +7,8 @@ If the answer is not in the context, say "I don’t know".
 """
 
 def build_prompt(context_chunks: list[str], question: str) -> str:
-    context = "\n\n".join(context_chunks)
+    # Ranked chunks, near-duplicates dropped, cut to the model's token budget
+    context = SEPARATOR.join(select_texts(context_chunks))
 
     return f"""
 {SYSTEM_PROMPT}
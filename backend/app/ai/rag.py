@@ -8,7 +8,7 @@ SYSTEM_PROMPT = (
 )
 
 def answer_question(question: str) -> str:
-    context = retrieve_context(question)
+    context = "\n\n".join(retrieve_context(question))
 
     return generate_answer(
         query=question,
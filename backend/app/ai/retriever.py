@@ -1,21 +1,109 @@
-import faiss
-import numpy as np
-from app.ai.embeddings import embed_text
-from app.ai.vector_store import INDEX_PATH, load_index, load_documents
+import re
 
-TOP_K = 3
+from app.ai.context_builder import select_hits
+from app.ai.embeddings import embed_batch, embed_text
+from app.ai.keyword_index import tokenize
+from app.ai.namespaces import keyword_search, search
+from app.ai.vector_store import Hit
+from app.core.config import settings
 
-def retrieve_context(query: str) -> list[str]:
-    index = load_index()
-    docs = load_documents()
+# Clause / section numbers such as "1011.5" or "4.2.1"
+CLAUSE = re.compile(r"\b\d+(?:\.\d+)+\b")
 
-    query_vector = np.array([embed_text(query)]).astype("float32")
 
-    distances, indices = index.search(query_vector, TOP_K)
+def fuse(result_lists: list[list[Hit]], top_k: int, k: int | None = None) -> list[Hit]:
+    """
+    Reciprocal-rank fusion: every list adds 1 / (k + rank) to a chunk's
+    score, so chunks ranked well by both keyword and vector search win.
+    """
+    k = settings.HYBRID_RRF_K if k is None else k
+    scores: dict = {}
+    best: dict = {}
+    for hits in result_lists:
+        for rank, hit in enumerate(hits, start=1):
+            key = (hit.namespace, hit.id)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            # Keep the vector distance when the chunk has one
+            if key not in best or hit.distance < best[key].distance:
+                best[key] = hit
 
-    results = []
-    for idx in indices[0]:
-        if idx != -1:
-            results.append(docs[idx])
+    ranked = sorted(scores, key=lambda key: -scores[key])[:top_k]
+    return [best[key]._replace(score=scores[key]) for key in ranked]
 
-    return results
+
+def keyword_confident(query: str, hits: list[Hit]) -> bool:
+    """
+    True for clause lookups ("IBC 1011.5") whose best BM25 hit contains
+    the clause and clearly outscores the runner-up.
+    """
+    clauses = set(CLAUSE.findall(query))
+    if not clauses or not hits:
+        return False
+    if not clauses & set(tokenize(hits[0].text)):
+        return False
+    return len(hits) == 1 or hits[0].score >= settings.KEYWORD_CONFIDENCE_MARGIN * hits[1].score
+
+
+def retrieve(query: str, top_k: int | None = None, namespaces: list[str] | None = None,
+             where: dict | None = None):
+    """
+    Hybrid retrieval: (query embedding or None, Hits best first).
+
+    BM25 runs first; a confident clause lookup returns straight away
+    without calling the embedding API. Otherwise the keyword and vector
+    result lists are fused with reciprocal-rank fusion. Up to `top_k`
+    (default CONTEXT_MAX_CHUNKS) hits are returned, unfiltered; the
+    context builder decides how many make it into the prompt.
+    """
+    top_k = top_k or settings.CONTEXT_MAX_CHUNKS
+    if not settings.HYBRID_SEARCH_ENABLED:
+        query_vector = embed_text(query)
+        return query_vector, search([query_vector], top_k, namespaces, where)[0]
+
+    n_candidates = top_k * max(1, settings.HYBRID_CANDIDATE_FACTOR)
+    keyword_hits = keyword_search(query, n_candidates, namespaces, where)
+    if settings.KEYWORD_SHORT_CIRCUIT and keyword_confident(query, keyword_hits):
+        return None, keyword_hits[:top_k]
+
+    query_vector = embed_text(query)
+    vector_hits = search([query_vector], n_candidates, namespaces, where)[0]
+    return query_vector, fuse([keyword_hits, vector_hits], top_k)
+
+
+def retrieve_batch(queries: list[str], top_k: int | None = None, namespaces: list[str] | None = None,
+                   where: dict | None = None):
+    """
+    retrieve() for many queries: ([embedding or None per query],
+    [Hits per query]). Queries BM25 can't answer alone are embedded in one
+    embed_batch call and searched as one multi-row FAISS search.
+    """
+    if not queries:
+        return [], []
+    top_k = top_k or settings.CONTEXT_MAX_CHUNKS
+
+    hybrid = settings.HYBRID_SEARCH_ENABLED
+    n_candidates = top_k * max(1, settings.HYBRID_CANDIDATE_FACTOR) if hybrid else top_k
+
+    keyword_rows = [keyword_search(query, n_candidates, namespaces, where) if hybrid else [] for query in queries]
+    embeddings = [None] * len(queries)
+    results = [hits[:top_k] for hits in keyword_rows]
+
+    pending = [
+        i for i, query in enumerate(queries)
+        if not (hybrid and settings.KEYWORD_SHORT_CIRCUIT and keyword_confident(query, keyword_rows[i]))
+    ]
+    if not pending:
+        return embeddings, results
+
+    vectors = embed_batch([queries[i] for i in pending])
+    vector_rows = search(vectors, n_candidates, namespaces, where)
+    for i, vector, vector_hits in zip(pending, vectors, vector_rows):
+        embeddings[i] = vector
+        results[i] = fuse([keyword_rows[i], vector_hits], top_k) if hybrid else vector_hits
+
+    return embeddings, results
+
+
+def retrieve_context(query: str, namespaces: list[str] | None = None, where: dict | None = None) -> list[str]:
+    _, hits = retrieve(query, None, namespaces, where)
+    return [hit.text for hit in select_hits(hits)]
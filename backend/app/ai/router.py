@@ -1,14 +1,57 @@
 from fastapi import APIRouter, Depends
-from app.core.security import get_current_user
-from app.ai.schemas import AskRequest, AskResponse
-from app.ai.service import ask_ai
+from fastapi.responses import StreamingResponse
+from app.core.security import get_current_user_id
+from app.ai.schemas import AskRequest, AskResponse, AskBatchRequest, AskBatchResponse
+from app.ai.service import aask_ai, aask_batch, astream_ask
+from app.ai.sse import sse_event, SSE_HEADERS
+from app.ai.semantic_cache import answer_cache
 
 # This router provides the /ai/ask endpoint (separate from /ai/generate_design)
 router = APIRouter(prefix="/ai", tags=["AI-Ask"])
 
 @router.post("/ask", response_model=AskResponse)
-def ask(request: AskRequest, user=Depends(get_current_user)):
-    return ask_ai(
+async def ask(request: AskRequest, user_id: int = Depends(get_current_user_id)):
+    return await aask_ai(
         query=request.query,
-        user_id=user.id
+        user_id=user_id
     )
+
+
+@router.post("/ask/batch", response_model=AskBatchResponse)
+async def ask_batch(request: AskBatchRequest, user_id: int = Depends(get_current_user_id)):
+    """
+    Many /ai/ask questions in one call, sharing one embeddings request and
+    one vector search; answers come back in request order.
+    """
+    return await aask_batch(
+        queries=request.queries,
+        user_id=user_id
+    )
+
+
+@router.post("/ask/stream")
+async def ask_stream(request: AskRequest, user_id: int = Depends(get_current_user_id)):
+    """
+    Same as /ai/ask, streamed as server-sent events:
+    `token` for each text delta, then `done` with the full answer, or
+    `error` instead if the answer failed (the stream ends there).
+    """
+
+    async def events():
+        parts = []
+        try:
+            async for delta in astream_ask(query=request.query, user_id=user_id):
+                parts.append(delta)
+                yield sse_event("token", {"text": delta})
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+            return
+        yield sse_event("done", {"answer": "".join(parts)})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.get("/cache/stats")
+def cache_stats(user_id: int = Depends(get_current_user_id)):
+    """Semantic answer cache hit rate and LLM time saved"""
+    return answer_cache.stats()
@@ -1,7 +1,15 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
 
 class AskRequest(BaseModel):
     query: str
 
 class AskResponse(BaseModel):
     answer: str
+
+class AskBatchRequest(BaseModel):
+    queries: list[str] = Field(..., min_length=1, max_length=settings.ASK_BATCH_MAX_QUERIES)
+
+class AskBatchResponse(BaseModel):
+    answers: list[str]  # same order as the queries
@@ -0,0 +1,129 @@
+import hashlib
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from app.core.config import settings
+from app.ai import namespaces
+
+
+def context_hash(context: str) -> str:
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+
+class _Entry:
+    __slots__ = ("vector", "context_hash", "answer", "created_at", "latency")
+
+    def __init__(self, vector, context_hash, answer, latency):
+        self.vector = vector
+        self.context_hash = context_hash
+        self.answer = answer
+        self.created_at = time.monotonic()
+        self.latency = latency
+
+
+class SemanticCache:
+    """
+    Answer cache keyed on the query embedding.
+
+    A lookup hits when an earlier query in the same namespace has cosine
+    similarity >= threshold *and* was answered from exactly the same
+    retrieved context. Entries expire after `ttl` seconds, the least
+    recently used are evicted past `max_entries`, and everything is dropped
+    when the vector store generation changes.
+    """
+
+    def __init__(self, threshold: float, ttl: float, max_entries: int):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._entries: OrderedDict[int, tuple[str, _Entry]] = OrderedDict()
+        self._ids = itertools.count()
+        self._generation = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype="float32").ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_generation(self):
+        # Caller holds the lock
+        generation = namespaces.generation()
+        if generation != self._generation:
+            self._entries.clear()
+            self._generation = generation
+
+    def lookup(self, namespace: str, query_vector, context: str):
+        """
+        Return a cached answer or None.
+        """
+        vector = self._normalize(query_vector)
+        ctx = context_hash(context)
+        now = time.monotonic()
+
+        with self._lock:
+            self._check_generation()
+
+            keys, vectors, expired = [], [], []
+            for key, (ns, entry) in self._entries.items():
+                if now - entry.created_at >= self.ttl:
+                    expired.append(key)
+                elif ns == namespace and entry.context_hash == ctx:
+                    keys.append(key)
+                    vectors.append(entry.vector)
+            for key in expired:
+                del self._entries[key]
+
+            if keys:
+                scores = np.stack(vectors) @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key = keys[best]
+                    self._entries.move_to_end(key)
+                    entry = self._entries[key][1]
+                    self.hits += 1
+                    self.latency_saved += entry.latency
+                    return entry.answer
+
+            self.misses += 1
+            return None
+
+    def put(self, namespace: str, query_vector, context: str, answer, latency: float = 0.0):
+        entry = _Entry(self._normalize(query_vector), context_hash(context), answer, latency)
+
+        with self._lock:
+            self._check_generation()
+            self._entries[next(self._ids)] = (namespace, entry)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "latency_saved_seconds": round(self.latency_saved, 3),
+        }
+
+
+answer_cache = SemanticCache(
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+    ttl=settings.SEMANTIC_CACHE_TTL,
+    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+)
@@ -1,36 +1,146 @@
-from app.ai.embeddings import embed_text
-from app.ai.vector_store import search_vectors
-from app.ai.llm.generate import generate_answer
+from app.ai import retriever
+from app.ai.context_builder import build_context
+from app.ai.llm.generate import generate_answer, agenerate_answer, astream_answer
 
-from app.ai.agents.design_agent import run_design_agent
-from app.ai.agents.compliance_agent import run_compliance_agent
+from app.ai.agents.design_agent import run_design_agent, arun_design_agent, astream_design_agent, make_design_output
+from app.ai.agents.compliance_agent import run_compliance_agent, arun_compliance_agent
+from app.ai.semantic_cache import answer_cache
+from app.core.concurrency import run_blocking
+from app.core.config import settings
+from app.core.metrics import timed
+from anyio import CapacityLimiter
+import asyncio
+import time
 
+COMPLIANCE_FALLBACK = {
+    "notes": "Compliance check completed. Please review design against local building codes.",
+    "status": "needs_review"
+}
 
-def generate_design(prompt: str):
+
+def retrieve(query: str, top_k: int | None = None, namespaces: list[str] | None = None, where: dict | None = None):
+    """
+    Hybrid retrieval; returns (query_embedding, RAG context packed to the
+    model's token budget).
+    Only `namespaces` (default: global) are searched, filtered by `where`.
+    The embedding is None when a confident keyword match skipped it.
+    """
+    query_embedding, hits = retriever.retrieve(query, top_k, namespaces, where)
+    return query_embedding, build_context(hits)
+
+
+def retrieve_many(queries: list[str], top_k: int | None = None):
+    """
+    Batched retrieve(): one embeddings request and one multi-row search.
+    Returns (query_embeddings, contexts); queries that retrieved the same
+    chunks share one context string.
+    """
+    embeddings, results = retriever.retrieve_batch(queries, top_k)
+    contexts = {}
+    docs = [
+        contexts.setdefault(
+            tuple((hit.namespace, hit.id) for hit in hits),
+            build_context(hits),
+        )
+        for hits in results
+    ]
+    return embeddings, docs
+
+
+# =========================
+# SEMANTIC ANSWER CACHE
+# =========================
+def _cached(namespace: str, query_embedding, docs: str):
+    if query_embedding is None or not settings.SEMANTIC_CACHE_ENABLED:
+        return None
+    return answer_cache.lookup(namespace, query_embedding, docs)
+
+
+def _remember(namespace: str, query_embedding, docs: str, answer, started: float):
+    if query_embedding is None or not settings.SEMANTIC_CACHE_ENABLED:
+        return
+    answer_cache.put(namespace, query_embedding, docs, answer, time.perf_counter() - started)
+
+
+def generate_design(prompt: str, namespaces: list[str] | None = None, where: dict | None = None):
     """
     Agent + RAG powered design generation
     """
 
     try:
-        # 1️⃣ Embed query
-        query_embedding = embed_text(prompt)
+        # 1️⃣ Embed query + 2️⃣ Retrieve context (RAG)
+        query_embedding, docs = retrieve(prompt, namespaces=namespaces, where=where)
 
-        # 2️⃣ Retrieve context (RAG)
-        docs = search_vectors(query_embedding, top_k=3)
+        cached = _cached("design", query_embedding, docs)
+        if cached is not None:
+            return dict(cached)
 
         # 3️⃣ Design Agent reasoning
-        design_output = run_design_agent(
-            user_prompt=prompt,
-            context=docs
-        )
+        started = time.perf_counter()
+        with timed("llm"):
+            design_output = run_design_agent(
+                user_prompt=prompt,
+                context=docs
+            )
+        _remember("design", query_embedding, docs, design_output, started)
 
         return design_output
     except Exception as e:
         # Fallback if RAG fails
-        return run_design_agent(
+        with timed("llm"):
+            return run_design_agent(
+                user_prompt=prompt,
+                context=""
+            )
+
+
+async def agenerate_design(prompt: str, namespaces: list[str] | None = None, where: dict | None = None):
+    """
+    Async generate_design: retrieval runs on the bounded "embedding"
+    threadpool, the LLM call is awaited on the shared async client
+    """
+    try:
+        query_embedding, docs = await run_blocking("embedding", retrieve, prompt, namespaces=namespaces, where=where)
+    except Exception as e:
+        # Fallback if RAG fails
+        query_embedding, docs = None, ""
+
+    cached = _cached("design", query_embedding, docs)
+    if cached is not None:
+        return dict(cached)
+
+    started = time.perf_counter()
+    with timed("llm"):
+        design_output = await arun_design_agent(
             user_prompt=prompt,
-            context=""
+            context=docs
         )
+    _remember("design", query_embedding, docs, design_output, started)
+    return design_output
+
+
+async def astream_design(prompt: str, namespaces: list[str] | None = None, where: dict | None = None):
+    """
+    Streaming agenerate_design: yields narrative text deltas
+    """
+    try:
+        query_embedding, docs = await run_blocking("embedding", retrieve, prompt, namespaces=namespaces, where=where)
+    except Exception as e:
+        # Fallback if RAG fails
+        query_embedding, docs = None, ""
+
+    cached = _cached("design", query_embedding, docs)
+    if cached is not None:
+        yield cached["narrative"]
+        return
+
+    started = time.perf_counter()
+    parts = []
+    with timed("llm"):
+        async for delta in astream_design_agent(user_prompt=prompt, context=docs):
+            parts.append(delta)
+            yield delta
+    _remember("design", query_embedding, docs, make_design_output("".join(parts)), started)
 
 
 def check_compliance(design_text: str):
@@ -38,13 +148,20 @@ def check_compliance(design_text: str):
     Compliance agent (can also use RAG later)
     """
     try:
-        return run_compliance_agent(design_text)
+        with timed("compliance"):
+            return run_compliance_agent(design_text)
     except Exception as e:
         # Fallback
-        return {
-            "notes": "Compliance check completed. Please review design against local building codes.",
-            "status": "needs_review"
-        }
+        return dict(COMPLIANCE_FALLBACK)
+
+
+async def acheck_compliance(design_text: str):
+    try:
+        with timed("compliance"):
+            return await arun_compliance_agent(design_text)
+    except Exception as e:
+        # Fallback
+        return dict(COMPLIANCE_FALLBACK)
 
 
 def ask_ai(query: str, user_id: int):
@@ -52,19 +169,103 @@ def ask_ai(query: str, user_id: int):
     Generic Q&A endpoint (kept for future chatbot)
     """
     try:
-        query_embedding = embed_text(query)
-        docs = search_vectors(query_embedding, top_k=3)
+        query_embedding, docs = retrieve(query)
 
-        answer = generate_answer(
-            query=query,
-            context=docs
-        )
+        cached = _cached("ask", query_embedding, docs)
+        if cached is not None:
+            return {"answer": cached}
+
+        started = time.perf_counter()
+        with timed("llm"):
+            answer = generate_answer(
+                query=query,
+                context=docs
+            )
+        _remember("ask", query_embedding, docs, answer, started)
 
         return {"answer": answer}
     except Exception as e:
         # Fallback
-        answer = generate_answer(
-            query=query,
-            context=""
-        )
+        with timed("llm"):
+            answer = generate_answer(
+                query=query,
+                context=""
+            )
         return {"answer": answer}
+
+
+async def _aanswer(query: str, query_embedding, docs: str) -> str:
+    cached = _cached("ask", query_embedding, docs)
+    if cached is not None:
+        return cached
+
+    try:
+        started = time.perf_counter()
+        with timed("llm"):
+            answer = await agenerate_answer(query=query, context=docs)
+        _remember("ask", query_embedding, docs, answer, started)
+    except Exception as e:
+        # Fallback
+        with timed("llm"):
+            answer = await agenerate_answer(query=query, context="")
+    return answer
+
+
+async def aask_ai(query: str, user_id: int):
+    try:
+        query_embedding, docs = await run_blocking("embedding", retrieve, query)
+    except Exception as e:
+        query_embedding, docs = None, ""
+
+    return {"answer": await _aanswer(query, query_embedding, docs)}
+
+
+async def aask_batch(queries: list[str], user_id: int):
+    """
+    Answer many questions in one go: retrieval for all of them is one
+    embeddings request and one multi-row search, then the LLM calls run
+    concurrently (at most ASK_BATCH_CONCURRENCY at a time, within the
+    shared "llm" limit). Repeated questions are answered once; answers
+    keep the order of `queries`.
+    """
+    unique = list(dict.fromkeys(queries))
+    try:
+        embeddings, docs = await run_blocking("embedding", retrieve_many, unique)
+    except Exception as e:
+        embeddings, docs = [None] * len(unique), [""] * len(unique)
+
+    batch_limit = CapacityLimiter(settings.ASK_BATCH_CONCURRENCY)
+
+    async def answer(query, query_embedding, context):
+        async with batch_limit:
+            return await _aanswer(query, query_embedding, context)
+
+    answers = await asyncio.gather(*(
+        answer(query, query_embedding, context)
+        for query, query_embedding, context in zip(unique, embeddings, docs)
+    ))
+    by_query = dict(zip(unique, answers))
+    return {"answers": [by_query[query] for query in queries]}
+
+
+async def astream_ask(query: str, user_id: int):
+    """
+    Streaming aask_ai: yields answer text deltas
+    """
+    try:
+        query_embedding, docs = await run_blocking("embedding", retrieve, query)
+    except Exception as e:
+        query_embedding, docs = None, ""
+
+    cached = _cached("ask", query_embedding, docs)
+    if cached is not None:
+        yield cached
+        return
+
+    started = time.perf_counter()
+    parts = []
+    with timed("llm"):
+        async for delta in astream_answer(query=query, context=docs):
+            parts.append(delta)
+            yield delta
+    _remember("ask", query_embedding, docs, "".join(parts), started)
@@ -0,0 +1,14 @@
+import json
+
+
+def sse_event(event: str, data) -> str:
+    """
+    Format one server-sent event; `data` is sent as JSON.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # stop nginx from buffering the stream
+}
@@ -1,7 +1,34 @@
 import faiss
+import json
 import numpy as np
 import os
 import pickle
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Mapping, NamedTuple
+
+from app.core.config import settings
+from app.core.metrics import timed
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+from app.ai import index_types
+from app.ai.context_builder import build_context
+from app.ai.keyword_index import KeywordIndex
+from app.ai.doc_store import (
+    MappedDocuments,
+    MappedVectors,
+    MappingOverlay,
+    write_documents,
+    write_vectors,
+)
 
 # =========================
 # CONFIG
@@ -10,91 +37,694 @@ BASE_DIR = os.path.dirname(__file__)
 DATA_DIR = os.path.join(BASE_DIR, "data")
 
 INDEX_PATH = os.path.join(DATA_DIR, "faiss.index")
-DOCS_PATH = os.path.join(DATA_DIR, "documents.pkl")
+DOCS_PATH = os.path.join(DATA_DIR, "documents.bin")
+LEGACY_DOCS_PATH = os.path.join(DATA_DIR, "documents.pkl")
+VECTORS_PATH = os.path.join(DATA_DIR, "vectors.bin")
+METADATA_PATH = os.path.join(DATA_DIR, "metadata.bin")
+
+# Every save writes a new generation of files (faiss.<n>.index,
+# documents.<n>.bin, ...) and then swaps store.json over to it; files that
+# are memory-mapped are never replaced in place, which Windows refuses.
+# Older generations are removed once nothing maps them any more.
+STORE_FILE = "store.json"
+LOCK_FILE = "write.lock"
+_GENERATION_FILES = {
+    "index": "faiss.{}.index",
+    "documents": "documents.{}.bin",
+    "vectors": "vectors.{}.bin",
+    "metadata": "metadata.{}.bin",
+}
+_GENERATION_NAME = re.compile(r"^(?:faiss\.(\d+)\.index|(?:documents|vectors|metadata)\.(\d+)\.bin)$")
 
 DIM = 1536
 
 # =========================
-# INIT INDEX
+# SAVE / LOAD
+# =========================
+def new_index():
+    """
+    Empty index addressed by stable vector ids, so entries can be removed
+    without renumbering everything after them.
+    """
+    return index_types.build_index("flat", DIM)
+
+
+def _upgrade_legacy(index, documents):
+    """
+    Older ingests wrote a bare positional index + a list of texts;
+    re-key them as ids 0..n-1.
+    """
+    if isinstance(documents, list):
+        documents = dict(enumerate(documents))
+    if isinstance(index, faiss.IndexFlat):
+        upgraded = new_index()
+        if index.ntotal:
+            upgraded.add_with_ids(
+                index.reconstruct_n(0, index.ntotal),
+                np.arange(index.ntotal, dtype="int64"),
+            )
+        index = upgraded
+    return index, documents
+
+
+def _legacy_docs_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".pkl"
+
+
+def load_index(path: str = INDEX_PATH, mmap: bool | None = None):
+    if not os.path.exists(path):
+        raise RuntimeError("FAISS index not found. Run ingestion first.")
+
+    if settings.VECTOR_STORE_MMAP if mmap is None else mmap:
+        # Share one page-cache copy between worker processes
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    return faiss.read_index(path)
+
+
+def load_documents(path: str = DOCS_PATH):
+    """
+    Memory-mapped id -> text mapping; falls back to a pickled
+    documents.pkl written by older versions.
+    """
+    if os.path.exists(path):
+        return MappedDocuments(path)
+
+    legacy = _legacy_docs_path(path)
+    if os.path.exists(legacy):
+        with open(legacy, "rb") as f:
+            return pickle.load(f)
+
+    raise RuntimeError("Documents file not found. Run ingestion first.")
+
+
+def load_vectors(path: str = VECTORS_PATH) -> Mapping:
+    """
+    Memory-mapped id -> full-precision vector; empty when the index
+    itself holds exact vectors and none were written.
+    """
+    if path is not None and os.path.exists(path):
+        return MappedVectors(path)
+    return {}
+
+
+def load_metadata(path: str = METADATA_PATH) -> Mapping:
+    """
+    Memory-mapped id -> JSON metadata; empty for stores written before
+    chunks carried metadata.
+    """
+    if path is not None and os.path.exists(path):
+        return MappedDocuments(path)
+    return {}
+
+
+@contextmanager
+def _exclusive(path: str):
+    """
+    Lock held across processes (every uvicorn worker opens the same store)
+    for as long as the block runs.
+    """
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after ~10 s; keep waiting
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# =========================
+# METADATA FILTERS
 # =========================
-index = faiss.IndexFlatL2(DIM)
-documents: list[str] = []
+# A filter maps a metadata field to one allowed value or a list of them:
+#     {"jurisdiction": ["IN", "general"], "doc_type": "fire_safety"}
+def _postings(metadata: Mapping) -> dict:
+    """{field: {value: [ids]}} over every hashable metadata value."""
+    postings: dict = {}
+    for doc_id in metadata:
+        for field, value in json.loads(metadata[doc_id]).items():
+            if isinstance(value, (str, int, float, bool)) or value is None:
+                postings.setdefault(field, {}).setdefault(value, []).append(doc_id)
+    return postings
+
+
+def _matching_ids(postings: dict, where: dict) -> np.ndarray:
+    """Sorted ids matching every field of `where`."""
+    matched = None
+    for field, allowed in where.items():
+        if not isinstance(allowed, (list, tuple, set, frozenset)):
+            allowed = [allowed]
+        values = postings.get(field, {})
+        ids = np.unique(np.array(
+            [doc_id for value in allowed for doc_id in values.get(value, ())],
+            dtype="int64",
+        ))
+        matched = ids if matched is None else np.intersect1d(matched, ids, assume_unique=True)
+        if not len(matched):
+            break
+    return matched if matched is not None else np.empty(0, dtype="int64")
+
 
 # =========================
-# SAVE / LOAD
+# RESIDENT STORE
 # =========================
-def save():
-    os.makedirs(DATA_DIR, exist_ok=True)
-    faiss.write_index(index, INDEX_PATH)
+class _StoreWriter:
+    """
+    Private working copy handed out by VectorStore.writer().
 
-    with open(DOCS_PATH, "wb") as f:
-        pickle.dump(documents, f)
+    Additions go straight into the index when it is ready. When the index
+    has to be (re)built -- a different INDEX_TYPE / VECTOR_STORAGE /
+    VECTOR_DIMS is configured, or an HNSW graph lost vectors -- vectors are
+    buffered and the index is trained on them once INDEX_TRAIN_SIZE rows
+    are pending or the writer finishes.
 
+    With a compact layout the full float32 vectors are kept alongside in
+    `vectors`; builds start from those, never from lossy reconstructions.
+    """
 
-def load_index():
-    if not os.path.exists(INDEX_PATH):
-        raise RuntimeError("FAISS index not found. Run ingestion first.")
+    def __init__(self, index, documents: MappingOverlay, vectors: MappingOverlay,
+                 metadata: MappingOverlay):
+        self.index = index
+        self.documents = documents
+        self.vectors = vectors
+        self.metadata = metadata  # id -> JSON string
+        self.keep_full = index_types.keeps_full_vectors(DIM)
+        self.recall = None      # recall@k of the last (re)build, after rescoring
+        self.recall_raw = None  # same, straight from the compact index
+        self._next_id = max(documents, default=-1) + 1
+        self._pending_ids: list[int] = []
+        self._pending_vectors: list[np.ndarray] = []
+
+        if self.keep_full and len(vectors) != len(documents):
+            # Written by a float32 layout: recover the full vectors from it
+            if index.d != DIM:
+                raise RuntimeError("Full-precision vectors missing. Re-run ingestion from scratch.")
+            ids = list(documents)
+            vectors.update(zip(ids, index_types.reconstruct_all(index, ids)))
+
+        if index_types.layout(index) != index_types.target_layout(len(documents), DIM):
+            self._unload()
+
+    def _full_vectors(self, ids) -> np.ndarray:
+        if len(self.vectors) == len(self.documents):
+            return np.stack([self.vectors[i] for i in ids]).astype("float32")
+        return index_types.reconstruct_all(self.index, ids)
+
+    def _unload(self):
+        """Move every stored vector back into the build buffer."""
+        ids = list(self.documents)
+        if ids:
+            self._pending_ids.extend(ids)
+            self._pending_vectors.append(self._full_vectors(ids))
+        self.index = None
+
+    def _build(self):
+        vectors = (
+            np.concatenate(self._pending_vectors)
+            if self._pending_vectors else np.empty((0, DIM), dtype="float32")
+        )
+        ids = np.array(self._pending_ids, dtype="int64")
+        kind, storage, dims = index_types.target_layout(len(self.documents), DIM)
+
+        compact = index_types.project(vectors, dims)
+        self.index = index_types.build_index(kind, dims, compact, storage)
+        if len(ids):
+            self.index.add_with_ids(compact, ids)
+            if (kind, storage, dims) != ("flat", "float32", DIM):
+                self.recall_raw = index_types.recall_at_k(self.index, vectors, ids)
+                self.recall = self.recall_raw
+                if self.keep_full:
+                    self.recall = index_types.recall_at_k(self.index, vectors, ids, full=self.vectors)
+
+        self._pending_ids, self._pending_vectors = [], []
+
+    def remove(self, ids):
+        ids = [int(i) for i in ids if int(i) in self.documents]
+        if not ids:
+            return
+        for i in ids:
+            del self.documents[i]
+            self.vectors.pop(i, None)
+            self.metadata.pop(i, None)
+
+        if self._pending_ids:
+            dropped = set(ids)
+            vectors = np.concatenate(self._pending_vectors)
+            keep = [n for n, i in enumerate(self._pending_ids) if i not in dropped]
+            self._pending_ids = [self._pending_ids[n] for n in keep]
+            self._pending_vectors = [vectors[keep]]
+
+        if self.index is None:
+            return
+        if index_types.supports_remove(self.index):
+            self.index.remove_ids(np.array(ids, dtype="int64"))
+        else:
+            # HNSW can't delete nodes: rebuild from the surviving vectors
+            self._unload()
 
-    return faiss.read_index(INDEX_PATH)
+    def add(self, texts: list[str], vectors, metadata: list[dict] | None = None) -> list[int]:
+        if not len(texts):
+            return []
+        vectors = np.array(vectors).astype("float32").reshape(-1, DIM)
+        assert vectors.shape[0] == len(texts), "One vector per text"
+        assert metadata is None or len(metadata) == len(texts), "One metadata dict per text"
 
+        new_ids = list(range(self._next_id, self._next_id + len(texts)))
+        self._next_id += len(texts)
+        self.documents.update(zip(new_ids, texts))
+        if metadata is not None:
+            self.metadata.update(
+                (i, json.dumps(meta, sort_keys=True)) for i, meta in zip(new_ids, metadata)
+            )
+        if self.keep_full:
+            self.vectors.update(zip(new_ids, vectors))
 
-def load_documents():
-    if not os.path.exists(DOCS_PATH):
-        raise RuntimeError("Documents file not found. Run ingestion first.")
+        if self.index is not None:
+            self.index.add_with_ids(
+                index_types.project(vectors, self.index.d),
+                np.array(new_ids, dtype="int64"),
+            )
+            return new_ids
+
+        self._pending_ids.extend(new_ids)
+        self._pending_vectors.append(vectors)
+        if len(self._pending_ids) >= settings.INDEX_TRAIN_SIZE:
+            self._build()
+        return new_ids
+
+    def finish(self):
+        if self.index is None:
+            self._build()
+        elif index_types.layout(self.index) != index_types.target_layout(len(self.documents), DIM):
+            # The corpus just grew past INDEX_MIN_TRAIN (or out of empty):
+            # switch to the configured layout
+            self._unload()
+            self._build()
+
+
+class Snapshot(NamedTuple):
+    index: object
+    documents: Mapping        # id -> text
+    vectors: Mapping          # id -> full float32 vector (compact layouts only)
+    metadata: Mapping         # id -> JSON metadata
+    generation: int
+
+
+class Hit(NamedTuple):
+    id: int
+    distance: float           # L2 to the query; inf for keyword-only hits
+    text: str
+    metadata: dict
+    namespace: str = ""
+    score: float = 0.0        # BM25 (keyword hits) or fused RRF score
+
+
+class VectorStore:
+    """
+    Process-wide FAISS index + id -> text document map, id -> metadata
+    map (+ id -> full vector map when the index stores compact vectors),
+    with a BM25 keyword index over the same ids.
+
+    Loaded from disk once and kept in memory. Every search reads an
+    immutable snapshot; when the files on disk change a background
+    thread reloads them and swaps the snapshot in, so lookups never wait
+    on disk after the first load.
+    """
+
+    def __init__(self, index_path: str = INDEX_PATH, docs_path: str = DOCS_PATH,
+                 vectors_path: str | None = None, metadata_path: str | None = None):
+        self.index_path = index_path
+        self.docs_path = docs_path
+        self.vectors_path = vectors_path or os.path.join(os.path.dirname(docs_path), "vectors.bin")
+        self.metadata_path = metadata_path or os.path.join(os.path.dirname(docs_path), "metadata.bin")
+        self.directory = os.path.dirname(docs_path)
+        self.store_path = os.path.join(self.directory, STORE_FILE)
+        self.keywords = KeywordIndex(os.path.join(self.directory, "keywords.sqlite3"))
+
+        self._index = new_index()
+        self._documents: dict[int, str] = {}
+        self._vectors: Mapping = {}
+        self._metadata: Mapping = {}
+        self._postings = (None, {})  # (generation, field postings), built on first filter
+        self._generation = 0
+        self._disk_generation = None
+
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._load_lock = threading.Lock()  # held for the whole first load
+        self._loaded = False
+        self._reloading = False
+        self._last_check = 0.0
+
+    # ---------- state ----------
+    @property
+    def generation(self) -> int:
+        """Bumped every time the resident data changes."""
+        self.ensure_loaded()
+        return self._generation
+
+    def snapshot(self) -> Snapshot:
+        """Consistent view of the resident data for one lookup."""
+        self.ensure_loaded()
+        with self._lock:
+            return Snapshot(self._index, self._documents, self._vectors, self._metadata, self._generation)
+
+    def _files(self) -> dict | None:
+        """
+        Generation number and paths of the files currently on disk; stores
+        written before generations use the fixed names as generation 0.
+        None when nothing was ingested yet.
+        """
+        try:
+            with open(self.store_path) as f:
+                current = json.load(f)
+        except FileNotFoundError:
+            docs_path = self.docs_path
+            if not os.path.exists(docs_path):
+                docs_path = _legacy_docs_path(docs_path)
+            if not (os.path.exists(self.index_path) and os.path.exists(docs_path)):
+                return None
+            return {
+                "generation": 0,
+                "index": self.index_path,
+                "documents": self.docs_path,
+                "vectors": self.vectors_path,
+                "metadata": self.metadata_path,
+            }
+        except (OSError, ValueError):
+            return None
+
+        files = {"generation": current["generation"]}
+        for kind in _GENERATION_FILES:
+            name = current.get(kind)
+            files[kind] = os.path.join(self.directory, name) if name else None
+        return files
+
+    def _swap(self, index, documents, vectors, metadata, disk_generation):
+        with self._lock:
+            self._index = index
+            self._documents = documents
+            self._vectors = vectors
+            self._metadata = metadata
+            self._disk_generation = disk_generation
+            self._generation += 1
+
+    # ---------- loading ----------
+    def _reload(self):
+        files = self._files()
+        if files is None:
+            return
+        try:
+            with timed("index_load"):
+                index = load_index(files["index"])
+                documents = load_documents(files["documents"])
+                vectors = load_vectors(files["vectors"])
+                metadata = load_metadata(files["metadata"])
+                index, documents = _upgrade_legacy(index, documents)
+        except Exception as e:
+            # Keep serving whatever we already have
+            print(f"WARNING: vector store reload failed: {e}")
+            return
+        self._swap(index, documents, vectors, metadata, files["generation"])
+
+    def _reload_in_background(self):
+        try:
+            self._reload()
+        finally:
+            self._reloading = False
+
+    def ensure_loaded(self):
+        """
+        Load synchronously on first use; afterwards only poll store.json
+        (at most every VECTOR_STORE_RELOAD_INTERVAL seconds) and reload in a
+        background thread when it points at a newer generation.
+        """
+        if not self._loaded:
+            # Concurrent cold callers wait here for the same first load
+            # rather than searching an empty index
+            with self._load_lock:
+                if not self._loaded:
+                    self._reload()
+                    self._last_check = time.monotonic()
+                    self._loaded = True
+            return
+
+        now = time.monotonic()
+        if now - self._last_check < settings.VECTOR_STORE_RELOAD_INTERVAL:
+            return
+        self._last_check = now
+
+        files = self._files()
+        if files is None or files["generation"] == self._disk_generation or self._reloading:
+            return
+
+        self._reloading = True
+        threading.Thread(target=self._reload_in_background, daemon=True).start()
+
+    # ---------- write ----------
+    @contextmanager
+    def writer(self):
+        """
+        Batch several removals/additions into one copy-on-write update.
+        Readers holding the old snapshot keep searching it; the new one is
+        persisted and swapped in only when the block exits cleanly.
+
+            with store.writer() as w:
+                w.remove(old_ids)
+                new_ids = w.add(texts, vectors)
+
+        Writers in other processes are serialised by a lock file, and the
+        working copy starts from the newest generation on disk, not from a
+        snapshot that may not have picked it up yet.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with self._write_lock, _exclusive(os.path.join(self.directory, LOCK_FILE)):
+            self.ensure_loaded()
+            files = self._files()
+            if files is not None and files["generation"] != self._disk_generation:
+                self._reload()
+            snap = self.snapshot()
+            writer = _StoreWriter(
+                self._writable(snap.index),
+                MappingOverlay(snap.documents),
+                MappingOverlay(snap.vectors),
+                MappingOverlay(snap.metadata),
+            )
+
+            yield writer
+
+            writer.finish()
+            self.save(
+                writer.index, writer.documents,
+                writer.vectors if writer.keep_full else None,
+                writer.metadata,
+            )
+            # Serve the freshly written files (mapped) rather than the
+            # in-memory working copy
+            self._reload()
+
+    def _writable(self, index):
+        try:
+            return faiss.clone_index(index)
+        except RuntimeError:
+            # Memory-mapped IVF lists can't be cloned; read a private copy
+            return load_index(self._files()["index"], mmap=False)
+
+    def update(self, texts: list[str], vectors: np.ndarray, remove_ids=(),
+               metadata: list[dict] | None = None) -> list[int]:
+        """
+        Remove `remove_ids` and append `texts`/`vectors` in one step.
+        Returns the new ids.
+        """
+        with self.writer() as w:
+            w.remove(remove_ids)
+            return w.add(texts, vectors, metadata)
+
+    def add(self, texts: list[str], vectors: np.ndarray, metadata: list[dict] | None = None) -> list[int]:
+        vectors = np.array(vectors).astype("float32")
+        assert vectors.ndim == 2, "Vectors must be 2D"
+        assert vectors.shape[1] == DIM, "Embedding dimension mismatch"
+        return self.update(texts, vectors, metadata=metadata)
+
+    def remove(self, ids) -> None:
+        self.update([], None, remove_ids=ids)
+
+    def save(self, index, documents, vectors=None, metadata=None):
+        """
+        Write a new generation of files, then point store.json at it:
+        readers reload either the old set or the new one, never a mix.
+        Without `vectors` the generation has no full-vector file; without
+        `metadata` it keeps a copy of the current one.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        current = self._files()
+        generation = (current["generation"] if current else 0) + 1
+        names = {kind: pattern.format(generation) for kind, pattern in _GENERATION_FILES.items()}
+
+        write_documents(os.path.join(self.directory, names["documents"]), documents)
+        if metadata is not None:
+            write_documents(os.path.join(self.directory, names["metadata"]), metadata)
+        elif current and current["metadata"] and os.path.exists(current["metadata"]):
+            shutil.copyfile(current["metadata"], os.path.join(self.directory, names["metadata"]))
+        else:
+            names["metadata"] = None
+        self._save_keywords(documents)
+        if vectors is not None:
+            write_vectors(os.path.join(self.directory, names["vectors"]), vectors, DIM)
+        else:
+            names["vectors"] = None
+        faiss.write_index(index, os.path.join(self.directory, names["index"]))
+
+        tmp = self.store_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"generation": generation, **names}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.store_path)
+        self._collect(generation)
+
+    def _collect(self, generation: int):
+        """
+        Remove generations before the previous one. Files still mapped
+        somewhere can't be removed on Windows; a later save retries.
+        """
+        for name in os.listdir(self.directory):
+            match = _GENERATION_NAME.match(name)
+            if match and int(match.group(1) or match.group(2)) < generation - 1:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def _save_keywords(self, documents):
+        """
+        Apply a writer's delta to the keyword index, or rebuild it when it
+        doesn't match the documents the delta was made against.
+        """
+        if isinstance(documents, MappingOverlay) and self.keywords.count() == len(documents.base):
+            self.keywords.apply(documents.added, documents.removed)
+        else:
+            self.keywords.rebuild(documents)
+
+    # ---------- read ----------
+    @staticmethod
+    def _rescore_source(snap: Snapshot):
+        if len(snap.vectors) and index_types.is_compact(snap.index, DIM):
+            return snap.vectors
+        return None
+
+    def _allowed_ids(self, snap: Snapshot, where: dict) -> np.ndarray:
+        generation, postings = self._postings
+        if generation != snap.generation:
+            postings = _postings(snap.metadata)
+            self._postings = (snap.generation, postings)
+        return _matching_ids(postings, where)
+
+    def find_ids(self, where: dict) -> list[int]:
+        """Ids whose metadata matches `where`."""
+        return self._allowed_ids(self.snapshot(), where).tolist()
+
+    def search_hits(self, query_vectors, top_k: int = 3, where: dict | None = None,
+                    nprobe: int | None = None, ef_search: int | None = None) -> list[list[Hit]]:
+        """
+        Search one or more query vectors; returns Hits (nearest first) per row.
+        `where` restricts the search to chunks whose metadata matches.
+        `nprobe` (IVF) / `ef_search` (HNSW) override the configured defaults.
+        Compact layouts fetch extra candidates and rescore them against the
+        memory-mapped full-precision vectors.
+        """
+        snap = self.snapshot()
+        documents, metadata = snap.documents, snap.metadata
+
+        allowed = self._allowed_ids(snap, where) if where else None
+        n = len(documents) if allowed is None else len(allowed)
+        if n == 0:
+            return [[] for _ in range(len(query_vectors))]
+
+        query_vectors = np.atleast_2d(np.asarray(query_vectors, dtype="float32"))
+        with timed("faiss_search"):
+            distances, indices = index_types.search(
+                snap.index, query_vectors, min(top_k, n), nprobe, ef_search,
+                full=self._rescore_source(snap), allowed=allowed,
+            )
+
+        return [
+            [
+                Hit(int(idx), float(dist), documents[idx],
+                    json.loads(metadata[idx]) if idx in metadata else {})
+                for dist, idx in zip(dist_row, id_row)
+                if idx in documents
+            ]
+            for dist_row, id_row in zip(distances, indices)
+        ]
+
+    def keyword_hits(self, query: str, top_k: int = 3, where: dict | None = None) -> list[Hit]:
+        """
+        BM25 keyword search; Hits (best first) carry the BM25 score.
+        """
+        snap = self.snapshot()
+        documents, metadata = snap.documents, snap.metadata
+
+        allowed = self._allowed_ids(snap, where) if where else None
+        if allowed is not None and not len(allowed):
+            return []
+
+        with timed("keyword_search"):
+            ranked = self.keywords.search(query, top_k, allowed)
+        return [
+            Hit(doc_id, float("inf"), documents[doc_id],
+                json.loads(metadata[doc_id]) if doc_id in metadata else {}, score=score)
+            for doc_id, score in ranked
+            # The keyword index can run ahead of this snapshot
+            if doc_id in documents
+        ]
+
+    def search(self, query_vectors, top_k: int = 3, where: dict | None = None,
+               nprobe: int | None = None, ef_search: int | None = None) -> list[list[str]]:
+        """
+        Search one or more query vectors; returns the matching texts per row.
+        """
+        return [
+            [hit.text for hit in row]
+            for row in self.search_hits(query_vectors, top_k, where, nprobe, ef_search)
+        ]
+
+
+# One resident store per process
+store = VectorStore()
 
-    with open(DOCS_PATH, "rb") as f:
-        return pickle.load(f)
 
 # =========================
 # ADD DOCUMENTS
 # =========================
-def add_documents(texts: list[str], vectors: np.ndarray):
-    global documents
-
-    vectors = np.array(vectors).astype("float32")
-    assert vectors.ndim == 2, "Vectors must be 2D"
-    assert vectors.shape[1] == DIM, "Embedding dimension mismatch"
+def save():
+    snap = store.snapshot()
+    store.save(snap.index, snap.documents, snap.vectors if len(snap.vectors) else None, snap.metadata)
 
-    index.add(vectors)
-    documents.extend(texts)
 
-    save()
+def add_documents(texts: list[str], vectors: np.ndarray) -> list[int]:
+    return store.add(texts, vectors)
 
 
 # =========================
 # SEARCH
 # =========================
-def search_vectors(query_embedding: list, top_k: int = 3) -> str:
+def search_vectors(query_embedding: list, top_k: int | None = None) -> str:
     """
     Search for similar documents using the query embedding.
-    Returns a string of concatenated document contexts.
-    """
-    global index, documents
-    
-    try:
-        # Try to load existing index
-        if os.path.exists(INDEX_PATH) and os.path.exists(DOCS_PATH):
-            index = load_index()
-            documents = load_documents()
-    except Exception:
-        # If loading fails, return empty context (mock mode)
-        pass
-    
-    # If no documents exist, return empty string
-    if len(documents) == 0:
-        return ""
-    
-    # Convert query embedding to numpy array
-    query_vector = np.array([query_embedding]).astype("float32")
-    
-    # Search
-    distances, indices = index.search(query_vector, min(top_k, len(documents)))
-    
-    # Collect results
-    results = []
-    for idx in indices[0]:
-        if idx != -1 and idx < len(documents):
-            results.append(documents[idx])
-    
-    # Return concatenated context
-    return "\n\n".join(results) if results else ""
\ No newline at end of file
+    Returns the prompt context built from up to `top_k` hits.
+    """
+    hits = store.search_hits([query_embedding], top_k or settings.CONTEXT_MAX_CHUNKS)[0]
+    return build_context(hits)
@@ -1,15 +1,21 @@
 # app/api/ai.py
 from fastapi import APIRouter, Depends, HTTPException, Form
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Optional
 from app.core.config import settings
-from app.core.database import get_db
-from app.core.security import get_current_user
-from app.models.user import User
+from app.core.database import AsyncSessionLocal
+from app.core.concurrency import limiter, run_blocking
+from app.core.security import get_current_user_id
+from app.core import sketches, versions
 from app.models.project import Project
-from app.ai.service import generate_design, check_compliance
+from app.ai.service import agenerate_design, acheck_compliance, astream_design
+from app.ai.agents.design_agent import make_design_output
+from app.ai.namespaces import GLOBAL, GENERAL_JURISDICTION, project_namespace
+from app.ai.sse import sse_event, SSE_HEADERS
+import re
 import base64
 import json
 
@@ -22,11 +28,58 @@ class GenerateDesignRequest(BaseModel):
     sketch_data: Optional[str] = None
 
 
+def _build_prompt(request: GenerateDesignRequest) -> str:
+    # Combine text brief and sketch context
+    prompt = f"Design brief: {request.text_brief}"
+    if request.sketch_data:
+        prompt += "\n\nUser has provided a sketch. Analyze the sketch and incorporate its elements into the design."
+    return prompt
+
+
+def _mock_design(text_brief: str):
+    design_narrative = f"Based on your brief '{text_brief}', this design incorporates modern architectural principles with sustainable materials. The layout emphasizes natural light and open spaces, creating a harmonious living environment."
+    compliance_notes = "✓ Meets standard building codes\n✓ Fire safety regulations compliant\n✓ Accessibility standards met\n✓ Structural requirements satisfied"
+    return design_narrative, compliance_notes
+
+
+async def _get_owned_project(db: AsyncSession, project_id: int, user_id: int) -> Project:
+    result = await db.execute(select(Project).where(
+        Project.id == project_id,
+        Project.owner_id == user_id
+    ))
+    project = result.scalars().first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project
+
+
+def _retrieval_scope(project: Project):
+    """
+    (namespaces, metadata filter) searched for a project's design: the
+    global codes, restricted to the project's jurisdiction when it has
+    one, plus all of the project's own uploads.
+    """
+    namespaces = [GLOBAL, project_namespace(project.id)]
+    jurisdiction = (project.extra_data or {}).get("jurisdiction")
+    where = {"jurisdiction": [jurisdiction, GENERAL_JURISDICTION]} if jurisdiction else None
+    return namespaces, where
+
+
+async def _owned_scope(project_id: int, user_id: int):
+    """
+    Ownership check plus _retrieval_scope() in a session of its own,
+    closed before generation starts so no pooled connection is held
+    through the LLM calls.
+    """
+    async with limiter("db"), AsyncSessionLocal() as db:
+        project = await _get_owned_project(db, project_id, user_id)
+        return _retrieval_scope(project)
+
+
 @router.post("/generate_design")
 async def generate_design_endpoint(
     request: GenerateDesignRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user_id: int = Depends(get_current_user_id)
 ):
     """
     Calls AI pipeline with sketch + brief.
@@ -35,59 +88,53 @@ async def generate_design_endpoint(
         - design_narrative: description
         - compliance_notes: building code checks
     """
+    if request.sketch_data:
+        sketches.check_size(request.sketch_data)
+
     # Verify project ownership
-    project = db.query(Project).filter(
-        Project.id == request.project_id,
-        Project.owner_id == current_user.id
-    ).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    namespaces, where = await _owned_scope(request.project_id, user_id)
     
-    # Combine text brief and sketch context
-    prompt = f"Design brief: {request.text_brief}"
-    if request.sketch_data:
-        prompt += "\n\nUser has provided a sketch. Analyze the sketch and incorporate its elements into the design."
+    prompt = _build_prompt(request)
     
     # Mock mode
     if settings.LLM_MODE == "mock":
-        design_narrative = f"Based on your brief '{request.text_brief}', this design incorporates modern architectural principles with sustainable materials. The layout emphasizes natural light and open spaces, creating a harmonious living environment."
-        compliance_notes = "✓ Meets standard building codes\n✓ Fire safety regulations compliant\n✓ Accessibility standards met\n✓ Structural requirements satisfied"
+        design_narrative, compliance_notes = _mock_design(request.text_brief)
         
         # Update project
-        project.design_narrative = design_narrative
-        project.compliance_notes = compliance_notes
-        project.design_concept_url = "/static/mock_model.glb"
-        if request.sketch_data:
-            project.sketch_data = request.sketch_data
-        db.commit()
+        version_id = await _save_design(
+            request.project_id, design_narrative, compliance_notes,
+            "/static/mock_model.glb", request.sketch_data, request.text_brief,
+        )
         
         return JSONResponse({
             "design_concept_url": "/static/mock_model.glb",
             "design_narrative": design_narrative,
-            "compliance_notes": compliance_notes
+            "compliance_notes": compliance_notes,
+            "version_id": version_id
         })
     
     # Real AI mode
     try:
         # Generate design using AI service
-        design_output = generate_design(prompt)
+        design_output = await agenerate_design(prompt, namespaces, where)
         design_narrative = design_output.get("narrative", "Design generated successfully.")
+        design_concept_url = design_output.get("model_url", "/static/mock_model.glb")
         
         # Check compliance
-        compliance_output = check_compliance(design_narrative)
+        compliance_output = await acheck_compliance(design_narrative)
         compliance_notes = compliance_output.get("notes", "Compliance check completed.")
         
         # Update project
-        project.design_narrative = design_narrative
-        project.compliance_notes = compliance_notes
-        if request.sketch_data:
-            project.sketch_data = request.sketch_data
-        db.commit()
+        version_id = await _save_design(
+            request.project_id, design_narrative, compliance_notes,
+            design_concept_url, request.sketch_data, request.text_brief,
+        )
         
         return JSONResponse({
-            "design_concept_url": design_output.get("model_url", "/static/mock_model.glb"),
+            "design_concept_url": design_concept_url,
             "design_narrative": design_narrative,
-            "compliance_notes": compliance_notes
+            "compliance_notes": compliance_notes,
+            "version_id": version_id
         })
     except Exception as e:
         # Fallback to mock on error
@@ -99,13 +146,101 @@ async def generate_design_endpoint(
         })
 
 
+async def _save_design(project_id: int, design_narrative: str, compliance_notes: str,
+                       design_concept_url: Optional[str], sketch_data: Optional[str],
+                       text_brief: Optional[str] = None) -> Optional[int]:
+    """
+    Persist a finished design and its version in a short session of its
+    own, opened only once generation has completed.
+    """
+    blob = await run_blocking("sketch", sketches.compress, sketch_data) if sketch_data else None
+    async with limiter("db"), AsyncSessionLocal() as db:
+        project = await db.get(Project, project_id)
+        if project is None:
+            return None
+        project.design_narrative = design_narrative
+        project.compliance_notes = compliance_notes
+        if design_concept_url:
+            project.design_concept_url = design_concept_url
+        if blob is not None:
+            sketches.store(project, blob)
+        version = await versions.record(
+            db, project_id, design_narrative, compliance_notes, text_brief, design_concept_url
+        )
+        await db.commit()
+        return version.id
+
+
+async def _mock_stream(text: str):
+    for piece in re.split(r"(\s+)", text):
+        if piece:
+            yield piece
+
+
+@router.post("/generate_design/stream")
+async def generate_design_stream(
+    request: GenerateDesignRequest,
+    user_id: int = Depends(get_current_user_id)
+):
+    """
+    Streaming /ai/generate_design over server-sent events:
+        - token: narrative text delta
+        - compliance: compliance notes, once the narrative is complete
+        - done: final payload, sent after the project has been saved
+        - error: generation failed; nothing is saved
+    """
+    if request.sketch_data:
+        sketches.check_size(request.sketch_data)
+    project_id = request.project_id
+    namespaces, where = await _owned_scope(project_id, user_id)
+    prompt = _build_prompt(request)
+
+    async def events():
+        parts = []
+        try:
+            if settings.LLM_MODE == "mock":
+                design_narrative, compliance_notes = _mock_design(request.text_brief)
+                deltas = _mock_stream(design_narrative)
+            else:
+                deltas = astream_design(prompt, namespaces, where)
+
+            async for delta in deltas:
+                parts.append(delta)
+                yield sse_event("token", {"text": delta})
+            design_narrative = "".join(parts)
+
+            # Same output the non-streaming path gets from agenerate_design
+            design_concept_url = make_design_output(design_narrative).get("model_url", "/static/mock_model.glb")
+
+            if settings.LLM_MODE != "mock":
+                compliance_output = await acheck_compliance(design_narrative)
+                compliance_notes = compliance_output.get("notes", "Compliance check completed.")
+            yield sse_event("compliance", {"compliance_notes": compliance_notes})
+
+            version_id = await _save_design(
+                project_id, design_narrative, compliance_notes,
+                design_concept_url, request.sketch_data, request.text_brief,
+            )
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+            return
+
+        yield sse_event("done", {
+            "design_concept_url": design_concept_url,
+            "design_narrative": design_narrative,
+            "compliance_notes": compliance_notes,
+            "version_id": version_id
+        })
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 @router.post("/generate_design/form")
 async def generate_design_form(
     project_id: int = Form(...),
     text_brief: str = Form(...),
     sketch_data: str = Form(None),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user_id: int = Depends(get_current_user_id)
 ):
     """Form-based endpoint for design generation"""
     request = GenerateDesignRequest(
@@ -113,4 +248,4 @@ async def generate_design_form(
         text_brief=text_brief,
         sketch_data=sketch_data
     )
-    return await generate_design_endpoint(request, current_user, db)
+    return await generate_design_endpoint(request, user_id)
@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, EmailStr
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.core.security import (
-    hash_password, verify_password, create_access_token, get_current_user
+    create_access_token, get_current_user, get_current_user_id
 )
+from app.core.passwords import ahash_password, averify_and_update
+from app.core.principal_cache import Principal, principal_cache
 from app.models.user import User
 from app.core.config import settings
 
@@ -27,10 +30,32 @@ class TokenResponse(BaseModel):
     user_id: int
     email: str
 
+
+async def _get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+
+async def _authenticate(db: AsyncSession, email: str, password: str) -> User:
+    user = await _get_user_by_email(db, email)
+    if not user or not user.hashed_password:
+        raise HTTPException(status_code=401, detail="Incorrect email or password")
+    
+    # bcrypt is deliberately slow; it runs in the hashing process pool
+    valid, new_hash = await averify_and_update(password, user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Incorrect email or password")
+    if new_hash:
+        # Stored with outdated cost parameters
+        user.hashed_password = new_hash
+        await db.commit()
+    return user
+
+
 @router.post("/register", response_model=TokenResponse)
-def register(user_data: UserRegister, db: Session = Depends(get_db)):
+async def register(user_data: UserRegister, db: AsyncSession = Depends(get_async_db)):
     # 1. Check if user exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await _get_user_by_email(db, user_data.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -38,7 +63,7 @@ def register(user_data: UserRegister, db: Session = Depends(get_db)):
         )
     
     # 2. Create new user
-    hashed_pwd = hash_password(user_data.password)
+    hashed_pwd = await ahash_password(user_data.password)
     user = User(
         email=user_data.email,
         hashed_password=hashed_pwd,
@@ -46,8 +71,7 @@ def register(user_data: UserRegister, db: Session = Depends(get_db)):
         provider="local"
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
     
     # 3. Create token
     token = create_access_token(data={"sub": str(user.id)})
@@ -59,31 +83,19 @@ def register(user_data: UserRegister, db: Session = Depends(get_db)):
     )
 
 @router.post("/login", response_model=TokenResponse)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not user.hashed_password:
-        raise HTTPException(status_code=401, detail="Incorrect email or password")
-    
-    if not verify_password(form_data.password, user.hashed_password):
-        raise HTTPException(status_code=401, detail="Incorrect email or password")
-    
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await _authenticate(db, form_data.username, form_data.password)
     token = create_access_token(data={"sub": str(user.id)})
     return TokenResponse(access_token=token, user_id=user.id, email=user.email)
 
 @router.post("/login/json", response_model=TokenResponse)
-def login_json(login_data: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == login_data.email).first()
-    if not user or not user.hashed_password:
-        raise HTTPException(status_code=401, detail="Incorrect email or password")
-    
-    if not verify_password(login_data.password, user.hashed_password):
-        raise HTTPException(status_code=401, detail="Incorrect email or password")
-    
+async def login_json(login_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    user = await _authenticate(db, login_data.email, login_data.password)
     token = create_access_token(data={"sub": str(user.id)})
     return TokenResponse(access_token=token, user_id=user.id, email=user.email)
 
 @router.get("/me")
-def get_current_user_info(user: User = Depends(get_current_user)):
+async def get_current_user_info(user: Principal = Depends(get_current_user)):
     return {
         "id": user.id,
         "email": user.email,
@@ -91,6 +103,11 @@ def get_current_user_info(user: User = Depends(get_current_user)):
         "provider": user.provider
     }
 
+@router.get("/cache/stats")
+def principal_cache_stats(user_id: int = Depends(get_current_user_id)):
+    """Authenticated-user cache hit rate, evictions and invalidations"""
+    return principal_cache.stats()
+
 @router.get("/ping")
 def ping():
     return {"ok": True}
\ No newline at end of file
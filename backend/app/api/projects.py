@@ -1,13 +1,23 @@
 # app/api/projects.py
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from typing import List, Optional
-from app.core.database import get_db
-from app.core.security import get_current_user
-from app.models.user import User
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, Field, model_validator
+from typing import Annotated, Any, List, Literal, Optional, Union
+from datetime import datetime
+import base64
+import json
+from app.core.config import settings
+from app.core.database import get_async_db, AsyncSessionLocal
+from app.core.security import get_current_user_id
 from app.models.project import Project
-from app.schemas.project import ProjectCreate, ProjectResponse
+from app.models.version import DesignVersion
+from app.schemas.project import ProjectCreate, ProjectResponse, ProjectSummary
+from app.core.concurrency import limiter, run_blocking
+from app.core import sketches, versions
+from app.ai.namespaces import GENERAL_JURISDICTION, drop_namespace, project_namespace
+from app.ai.ingestion.ingest import ingest_text
 
 router = APIRouter(prefix="/projects", tags=["Projects"])
 
@@ -16,117 +26,496 @@ class SketchUpload(BaseModel):
     sketch: str  # JSON from react-canvas-draw
 
 
+# RFC 6902 operations; anything else is rejected with 422 before the
+# stored sketch is read
+class PatchValueOp(BaseModel):
+    op: Literal["add", "replace", "test"]
+    path: str
+    value: Any
+
+
+class PatchRemoveOp(BaseModel):
+    op: Literal["remove"]
+    path: str
+
+
+class PatchFromOp(BaseModel):
+    op: Literal["move", "copy"]
+    path: str
+    from_: str = Field(alias="from")
+
+
+PatchOperation = Annotated[Union[PatchValueOp, PatchRemoveOp, PatchFromOp], Field(discriminator="op")]
+
+
+class SketchDelta(BaseModel):
+    # Exactly one of: strokes to append to `lines`, or an RFC 6902 JSON Patch
+    append: Optional[List[Any]] = None
+    patch: Optional[List[PatchOperation]] = None
+
+    @model_validator(mode="after")
+    def one_kind(self):
+        if (self.append is None) == (self.patch is None):
+            raise ValueError("Send either `append` or `patch`")
+        return self
+
+
 class ProjectUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
     sketch_data: Optional[str] = None
+    jurisdiction: Optional[str] = None  # limits retrieved codes to this + "general"
+
+
+class ProjectDocumentUpload(BaseModel):
+    name: str                       # re-uploading the same name replaces it
+    text: str                       # at most DOCUMENT_MAX_BYTES (UTF-8)
+    doc_type: Optional[str] = None
+
+
+# Columns GET /projects/ loads; the large text columns stay in the database
+SUMMARY_COLUMNS = (
+    Project.id,
+    Project.title,
+    Project.description,
+    Project.design_concept_url,
+    Project.created_at,
+    Project.updated_at,
+)
+
+
+def _encode_cursor(updated_at: datetime, project_id: int) -> str:
+    raw = json.dumps([updated_at.isoformat(), project_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        updated_at, project_id = json.loads(raw)
+        return datetime.fromisoformat(updated_at), int(project_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# Attempts at a delta when another write lands between read and update
+SKETCH_WRITE_ATTEMPTS = 3
+
+
+def _check_if_match(if_match: Optional[str], current: str):
+    if if_match is not None and if_match != "*" and current not in (tag.strip() for tag in if_match.split(",")):
+        raise HTTPException(status_code=412, detail="Sketch has changed")
+
+
+def _apply_delta(blob: Optional[bytes], legacy: Optional[str], delta: SketchDelta) -> bytes:
+    """Stored sketch + delta -> new compressed sketch (CPU-bound; runs in a thread)"""
+    doc = sketches.load(sketches.decompress(blob) if blob is not None else legacy)
+    if delta.append is not None:
+        doc = sketches.append_lines(doc, delta.append)
+    else:
+        doc = sketches.apply_patch(doc, [op.model_dump(by_alias=True) for op in delta.patch])
+    text = sketches.dump(doc)
+    sketches.check_size(text)
+    return sketches.compress(text)
+
+
+# Columns of a version listing; the texts themselves stay in design_texts
+VERSION_COLUMNS = (
+    DesignVersion.id,
+    DesignVersion.created_at,
+    DesignVersion.design_concept_url,
+    DesignVersion.narrative_digest,
+    DesignVersion.compliance_digest,
+    DesignVersion.brief_digest,
+)
+
+
+async def _check_owned(db: AsyncSession, project_id: int, owner_id: int) -> None:
+    result = await db.execute(select(Project.id).where(
+        Project.id == project_id,
+        Project.owner_id == owner_id
+    ))
+    if result.scalar() is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+
+async def _get_version(db: AsyncSession, project_id: int, version_id: int):
+    result = await db.execute(select(*VERSION_COLUMNS).where(
+        DesignVersion.id == version_id,
+        DesignVersion.project_id == project_id
+    ))
+    version = result.first()
+    if version is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+    return version
+
+
+async def _get_owned_project(db: AsyncSession, project_id: int, owner_id: int) -> Project:
+    result = await db.execute(select(Project).where(
+        Project.id == project_id,
+        Project.owner_id == owner_id
+    ))
+    project = result.scalars().first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project
 
 
 @router.post("/", response_model=ProjectResponse)
-def create_project(
+async def create_project(
     project: ProjectCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new project"""
     db_project = Project(
         title=project.title,
         description=project.description,
-        owner_id=current_user.id
+        owner_id=user_id
     )
     db.add(db_project)
-    db.commit()
-    db.refresh(db_project)
+    await db.commit()
+    await db.refresh(db_project)
     return db_project
 
 
-@router.get("/", response_model=List[ProjectResponse])
-def list_projects(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+@router.get("/", response_model=List[ProjectSummary])
+async def list_projects(
+    response: Response,
+    limit: int = Query(settings.PROJECTS_PAGE_SIZE, ge=1, le=settings.PROJECTS_PAGE_MAX),
+    cursor: Optional[str] = None,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """List all projects for the current user"""
-    projects = db.query(Project).filter(Project.owner_id == current_user.id).all()
-    return projects
+    """
+    List the current user's projects, most recently updated first.
+    When there are more, the X-Next-Cursor header holds the `cursor`
+    for the next page.
+    """
+    query = select(*SUMMARY_COLUMNS).where(Project.owner_id == user_id)
+    if cursor:
+        query = query.where(tuple_(Project.updated_at, Project.id) < _decode_cursor(cursor))
+    query = query.order_by(Project.updated_at.desc(), Project.id.desc()).limit(limit + 1)
+
+    rows = (await db.execute(query)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1].updated_at, rows[-1].id)
+    return rows
 
 
 @router.get("/{project_id}", response_model=ProjectResponse)
-def get_project(
+async def get_project(
     project_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific project"""
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.owner_id == current_user.id
-    ).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    return project
+    return await _get_owned_project(db, project_id, user_id)
 
 
 @router.put("/{project_id}", response_model=ProjectResponse)
-def update_project(
+async def update_project(
     project_id: int,
     project_update: ProjectUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update a project"""
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.owner_id == current_user.id
-    ).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    project = await _get_owned_project(db, project_id, user_id)
     
     if project_update.title is not None:
         project.title = project_update.title
     if project_update.description is not None:
         project.description = project_update.description
     if project_update.sketch_data is not None:
-        project.sketch_data = project_update.sketch_data
+        sketches.check_size(project_update.sketch_data)
+        sketches.store(project, await run_blocking("sketch", sketches.compress, project_update.sketch_data))
+    if project_update.jurisdiction is not None:
+        # Reassign so SQLAlchemy sees the JSON column change
+        project.extra_data = {**(project.extra_data or {}), "jurisdiction": project_update.jurisdiction}
     
-    db.commit()
-    db.refresh(project)
+    await db.commit()
+    await db.refresh(project)
     return project
 
 
 @router.delete("/{project_id}")
-def delete_project(
+async def delete_project(
     project_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a project"""
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.owner_id == current_user.id
-    ).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    project = await _get_owned_project(db, project_id, user_id)
     
-    db.delete(project)
-    db.commit()
+    await versions.delete_project_versions(db, project_id)
+    await db.delete(project)
+    await db.commit()
+    await run_blocking("embedding", drop_namespace, project_namespace(project_id))
     return {"status": "deleted"}
 
 
+@router.get("/{project_id}/sketch")
+async def get_sketch(
+    project_id: int,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Full sketch JSON, with an ETag; 304 when If-None-Match still matches.
+    Sent still compressed when the client accepts the stored encoding.
+    """
+    result = await db.execute(select(Project.sketch_version).where(
+        Project.id == project_id,
+        Project.owner_id == user_id
+    ))
+    version = result.scalar()
+    if version is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    tag = sketches.etag(project_id, version)
+    headers = {"ETag": tag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if if_none_match and tag in (t.strip() for t in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
+    result = await db.execute(select(Project.sketch_blob, Project.sketch_data).where(Project.id == project_id))
+    blob, legacy = result.one()
+    if blob is None and legacy is None:
+        raise HTTPException(status_code=404, detail="No sketch saved")
+
+    if blob is not None:
+        encoding = sketches.content_encoding(blob)
+        accepted = {e.split(";")[0].strip() for e in (accept_encoding or "").split(",")}
+        if encoding and encoding in accepted:
+            headers["Content-Encoding"] = encoding
+            return Response(blob, media_type="application/json", headers=headers)
+        legacy = await run_blocking("sketch", sketches.decompress, blob)
+    return Response(legacy, media_type="application/json", headers=headers)
+
+
 @router.post("/{project_id}/sketch")
 async def upload_sketch(
     project_id: int,
     payload: SketchUpload,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Save sketch JSON to project"""
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.owner_id == current_user.id
-    ).first()
-    if not project:
+    """
+    Replace the project's sketch with a full snapshot. With If-Match, fails
+    with 412 when the sketch changed since that ETag, even if the change
+    lands between this check and the write.
+    """
+    result = await db.execute(
+        select(Project.sketch_version).where(
+            Project.id == project_id,
+            Project.owner_id == user_id
+        )
+    )
+    version = result.scalar()
+    if version is None:
         raise HTTPException(status_code=404, detail="Project not found")
-    
-    project.sketch_data = payload.sketch
-    db.commit()
-    return {"status": "ok", "message": "Sketch saved"}
+    _check_if_match(if_match, sketches.etag(project_id, version))
+    sketches.check_size(payload.sketch)
+
+    blob = await run_blocking("sketch", sketches.compress, payload.sketch)
+    query = update(Project).where(Project.id == project_id)
+    if if_match is not None and if_match != "*":
+        # Only lands if nobody wrote the sketch since it was checked
+        query = query.where(Project.sketch_version == version)
+    result = await db.execute(
+        query.values(sketch_blob=blob, sketch_data=None, sketch_version=Project.sketch_version + 1)
+        .returning(Project.sketch_version)
+        .execution_options(synchronize_session=False)
+    )
+    new_version = result.scalar()
+    await db.commit()
+    if new_version is None:
+        raise HTTPException(status_code=412, detail="Sketch has changed")
+
+    response.headers["ETag"] = sketches.etag(project_id, new_version)
+    return {"status": "ok", "message": "Sketch saved", "version": new_version}
+
+
+@router.patch("/{project_id}/sketch")
+async def patch_sketch(
+    project_id: int,
+    delta: SketchDelta,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Apply stroke appends or a JSON Patch to the stored sketch. With
+    If-Match, fails with 412 when the sketch changed since that ETag;
+    without it, the delta is re-applied on top of concurrent writes.
+    """
+    for _ in range(SKETCH_WRITE_ATTEMPTS):
+        result = await db.execute(
+            select(Project.sketch_blob, Project.sketch_data, Project.sketch_version).where(
+                Project.id == project_id,
+                Project.owner_id == user_id
+            )
+        )
+        row = result.first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        blob, legacy, version = row
+        _check_if_match(if_match, sketches.etag(project_id, version))
+
+        try:
+            new_blob = await run_blocking("sketch", _apply_delta, blob, legacy, delta)
+        except sketches.SketchError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+        # Only lands if nobody wrote the sketch since it was read
+        result = await db.execute(
+            update(Project)
+            .where(Project.id == project_id, Project.sketch_version == version)
+            .values(sketch_blob=new_blob, sketch_data=None, sketch_version=version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        if result.rowcount == 1:
+            response.headers["ETag"] = sketches.etag(project_id, version + 1)
+            return {"status": "ok", "version": version + 1}
+        if if_match is not None:
+            raise HTTPException(status_code=412, detail="Sketch has changed")
+
+    raise HTTPException(status_code=409, detail="Sketch is being changed concurrently, retry")
+
+
+@router.get("/{project_id}/versions")
+async def list_versions(
+    project_id: int,
+    limit: Optional[int] = Query(None, ge=1),
+    before: Optional[int] = None,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Design history, newest first, streamed as NDJSON: one version per
+    line, with digests instead of text (equal digests = identical output).
+    `before` (a version id) and `limit` page through long histories.
+    """
+    await _check_owned(db, project_id, user_id)
+
+    query = select(*VERSION_COLUMNS).where(DesignVersion.project_id == project_id)
+    if before is not None:
+        query = query.where(DesignVersion.id < before)
+    query = query.order_by(DesignVersion.id.desc()).limit(limit)
+
+    async def lines():
+        # Own session: the request's one closes before the body is sent
+        async with AsyncSessionLocal() as session:
+            result = await session.stream(query.execution_options(yield_per=100))
+            async for row in result:
+                yield json.dumps({
+                    "id": row.id,
+                    "created_at": row.created_at.isoformat() if row.created_at else None,
+                    "design_concept_url": row.design_concept_url,
+                    "narrative_digest": row.narrative_digest,
+                    "compliance_digest": row.compliance_digest,
+                    "brief_digest": row.brief_digest,
+                }) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/{project_id}/versions/{version_id}")
+async def get_version(
+    project_id: int,
+    version_id: int,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """One version with its full text (versions never change)"""
+    await _check_owned(db, project_id, user_id)
+    version = await _get_version(db, project_id, version_id)
+    texts = await versions.load_texts(
+        db, [version.narrative_digest, version.compliance_digest, version.brief_digest]
+    )
+    return JSONResponse(
+        {
+            "id": version.id,
+            "created_at": version.created_at.isoformat() if version.created_at else None,
+            "design_concept_url": version.design_concept_url,
+            "design_narrative": texts.get(version.narrative_digest),
+            "compliance_notes": texts.get(version.compliance_digest),
+            "text_brief": texts.get(version.brief_digest),
+        },
+        headers={"Cache-Control": "private, max-age=31536000, immutable"},
+    )
+
+
+@router.get("/{project_id}/versions/{version_id}/diff")
+async def diff_version(
+    project_id: int,
+    version_id: int,
+    against: Optional[int] = None,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Unified diff of a version's narrative and compliance notes against
+    `against` (default: the version before it), streamed as plain text.
+    Only the two versions' differing texts are read.
+    """
+    await _check_owned(db, project_id, user_id)
+    new = await _get_version(db, project_id, version_id)
+    if against is None:
+        result = await db.execute(
+            select(*VERSION_COLUMNS)
+            .where(DesignVersion.project_id == project_id, DesignVersion.id < version_id)
+            .order_by(DesignVersion.id.desc())
+            .limit(1)
+        )
+        old = result.first()
+    else:
+        old = await _get_version(db, project_id, against)
+
+    fields = [
+        ("design_narrative", old.narrative_digest if old else None, new.narrative_digest),
+        ("compliance_notes", old.compliance_digest if old else None, new.compliance_digest),
+    ]
+    changed = [field for field in fields if field[1] != field[2]]
+    texts = await versions.load_texts(db, [key for _, a, b in changed for key in (a, b)])
+
+    old_name = f"version {old.id}" if old else "empty"
+    new_name = f"version {new.id}"
+
+    def lines():
+        # Sync generator: StreamingResponse runs difflib in a worker thread
+        for label, a, b in changed:
+            yield from versions.diff_lines(label, texts.get(a, ""), texts.get(b, ""), old_name, new_name)
+
+    return StreamingResponse(lines(), media_type="text/plain; charset=utf-8")
+
+
+@router.post("/{project_id}/documents")
+async def upload_document(
+    project_id: int,
+    payload: ProjectDocumentUpload,
+    user_id: int = Depends(get_current_user_id)
+):
+    """Add a text document to the project's own retrieval namespace"""
+    if len(payload.text.encode("utf-8")) > settings.DOCUMENT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Document too large")
+
+    # Own short session: none is held through chunking and embedding
+    async with limiter("db"), AsyncSessionLocal() as db:
+        project = await _get_owned_project(db, project_id, user_id)
+        jurisdiction = (project.extra_data or {}).get("jurisdiction")
+    metadata = {
+        "doc_type": payload.doc_type or "upload",
+        "jurisdiction": jurisdiction or GENERAL_JURISDICTION,
+    }
+    chunks = await run_blocking(
+        "embedding", ingest_text, project_namespace(project_id), payload.name, payload.text, metadata
+    )
+    return {"status": "ok", "chunks": chunks}
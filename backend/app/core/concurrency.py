@@ -0,0 +1,33 @@
+from functools import partial
+
+from anyio import CapacityLimiter, to_thread
+
+from app.core.config import settings
+
+# Max in-flight calls per downstream dependency, per worker process
+LIMITS = {
+    "db": settings.DB_CONCURRENCY,
+    "embedding": settings.EMBEDDING_CONCURRENCY,
+    "llm": settings.LLM_CONCURRENCY,
+    "sketch": settings.SKETCH_CONCURRENCY,
+}
+
+_limiters: dict[str, CapacityLimiter] = {}
+
+
+def limiter(name: str) -> CapacityLimiter:
+    """
+    Shared limiter for one dependency. Use `async with limiter("llm"):`
+    around awaitable calls, or run_blocking() for synchronous ones.
+    """
+    if name not in _limiters:
+        _limiters[name] = CapacityLimiter(LIMITS[name])
+    return _limiters[name]
+
+
+async def run_blocking(name: str, fn, *args, **kwargs):
+    """
+    Run a blocking call in a worker thread without stalling the event loop.
+    At most LIMITS[name] such calls run at once; the rest wait their turn.
+    """
+    return await to_thread.run_sync(partial(fn, *args, **kwargs), limiter=limiter(name))
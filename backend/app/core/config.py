@@ -8,6 +8,11 @@ class Settings(BaseSettings):
     SECRET_KEY: str = os.getenv("SECRET_KEY", "dev-secret-key-change-in-production-min-32-chars-required")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
     ALGORITHM: str = "HS256"
+    BCRYPT_ROUNDS: int = 12                   # changing it rehashes each password on its next login
+    PASSWORD_HASH_WORKERS: int = 0            # hashing processes per API process; 0 = min(4, CPUs)
+    PASSWORD_HASH_MAX_PENDING: int = 64       # queued + running hashes before sign-ins get 503
+    PRINCIPAL_CACHE_TTL: float = 60.0         # seconds an authenticated user is served from memory
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000  # 0 = always load from the database
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
 
     # OAuth
@@ -24,6 +29,100 @@ class Settings(BaseSettings):
     AI_TEMPERATURE: float = 0.7
     AI_MAX_TOKENS: int = 800
 
+    # Shared LLM client pool
+    LLM_MAX_CONNECTIONS: int = 50
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_TIMEOUT: float = 60.0
+    LLM_CONNECT_TIMEOUT: float = 5.0
+    LLM_MAX_RETRIES: int = 2
+
+    # Database engines (sync for startup/scripts, async for routes)
+    ASYNC_DATABASE_URL: str = ""      # default: DATABASE_URL with the aiosqlite / asyncpg driver
+    DB_ECHO: bool = False             # log every statement (development only)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800       # seconds; 0 = never
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 500  # compiled SQL cache (+ asyncpg prepared statements)
+    DB_SLOW_QUERY_MS: float = 200.0   # log statements slower than this; 0 = off
+
+    # GET /projects/ keyset pages
+    PROJECTS_PAGE_SIZE: int = 50
+    PROJECTS_PAGE_MAX: int = 200
+
+    # Sketch storage
+    SKETCH_COMPRESSION: str = "zstd"      # zstd (falls back to gzip without zstandard) | gzip
+    SKETCH_COMPRESSION_LEVEL: int = 3
+    SKETCH_MAX_BYTES: int = 16_000_000    # uncompressed sketch JSON
+
+    # Project document uploads
+    DOCUMENT_MAX_BYTES: int = 5_000_000   # UTF-8 text per upload
+
+    # Concurrency limits for work started from async endpoints
+    DB_CONCURRENCY: int = 20
+    EMBEDDING_CONCURRENCY: int = 8
+    LLM_CONCURRENCY: int = 32
+    SKETCH_CONCURRENCY: int = 4        # sketch compress / decompress / patch threads
+    ASK_BATCH_CONCURRENCY: int = 8     # LLM calls in flight per /ai/ask/batch request
+    ASK_BATCH_MAX_QUERIES: int = 100
+
+    # Embeddings
+    EMBEDDING_MODEL: str = "text-embedding-3-small"
+    EMBEDDING_BATCH_SIZE: int = 256          # max inputs per embeddings request
+    EMBEDDING_BATCH_MAX_TOKENS: int = 250000  # approx. token budget per request
+    EMBEDDING_MAX_RETRIES: int = 5            # 429 retries before the request fails
+    EMBEDDING_RETRY_MAX_DELAY: float = 60.0   # cap on one wait (Retry-After or exponential)
+    PDF_WORKERS: int = 0                      # 0 = one per CPU
+    PDF_PAGES_PER_TASK: int = 16
+    CHUNK_MAX_TOKENS: int = 400
+    CHUNK_OVERLAP_TOKENS: int = 50
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = ""            # default: app/ai/data/embedding_cache.sqlite3
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 200000
+
+    # Semantic answer cache
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95   # min cosine similarity for a hit
+    SEMANTIC_CACHE_TTL: float = 3600.0
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 2000
+
+    # Vector store: seconds between checks for a newer index on disk
+    VECTOR_STORE_RELOAD_INTERVAL: float = 5.0
+    VECTOR_STORE_MMAP: bool = True   # open index + documents read-only mmapped
+
+    # ANN index: "flat", "ivf_flat", "ivf_pq" or "hnsw"
+    INDEX_TYPE: str = "flat"
+    INDEX_NLIST: int = 1024          # IVF: max number of inverted lists
+    INDEX_NPROBE: int = 16           # IVF: lists scanned per query
+    INDEX_PQ_M: int = 64             # IVF-PQ: sub-quantizers (must divide the stored dims)
+    INDEX_PQ_NBITS: int = 8
+    INDEX_HNSW_M: int = 32
+    INDEX_EF_CONSTRUCTION: int = 200
+    INDEX_EF_SEARCH: int = 64
+    INDEX_TRAIN_SIZE: int = 50000    # training sample size / build buffer
+    INDEX_MIN_TRAIN: int = 2000      # IVF kinds stay flat below this many vectors
+
+    # Reduced-precision storage; full float32 vectors stay on disk for rescoring
+    VECTOR_STORAGE: str = "float32"  # float32 | float16 | sq8 (ignored by ivf_pq)
+    VECTOR_DIMS: int = 0             # 0 = full width; e.g. 256 / 512 (Matryoshka truncation)
+    VECTOR_RESCORE_FACTOR: int = 4   # candidates fetched per result before exact rescoring
+
+    # Prompt context: hits retrieved, then filtered and packed into a token budget
+    CONTEXT_MAX_CHUNKS: int = 8            # hits retrieved per query before filtering
+    CONTEXT_MAX_TOKENS: int = 1500         # default context budget per prompt
+    CONTEXT_TOKEN_BUDGETS: str = ""        # per-model overrides, e.g. "gpt-4o-mini=3000,gpt-4=1500"
+    CONTEXT_MAX_DISTANCE: float = 0.0      # squared L2 cut-off (~1.0 for OpenAI embeddings); 0 = off
+    CONTEXT_DISTANCE_RATIO: float = 1.5    # drop hits farther than this x the best hit; 0 = off
+    CONTEXT_DEDUP_THRESHOLD: float = 0.8   # word-set Jaccard above which a chunk is a near-duplicate
+
+    # Hybrid retrieval: BM25 keyword + vector results, fused by reciprocal rank
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_RRF_K: int = 60
+    HYBRID_CANDIDATE_FACTOR: int = 4       # results fetched from each list per final result
+    KEYWORD_SHORT_CIRCUIT: bool = True     # skip embedding clause lookups BM25 answers confidently
+    KEYWORD_CONFIDENCE_MARGIN: float = 1.5 # top BM25 score vs the runner-up
+
     # CORS - can be comma-separated string or list
     CORS_ORIGINS: str = "http://localhost:3000,http://localhost:3001,http://127.0.0.1:3000"
     
@@ -1,20 +1,117 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import logging
+import time
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from app.core.config import settings
+from app.core.metrics import stage_latency
 
-# Use SQLite if DATABASE_URL is not set or is SQLite
-if settings.DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(settings.DATABASE_URL, echo=True, connect_args={"check_same_thread": False})
-else:
-    engine = create_engine(settings.DATABASE_URL, echo=True)
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# URLS
+# =========================
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def async_url(url: str) -> str:
+    """DATABASE_URL with its driver swapped for the asyncio one"""
+    scheme, sep, rest = url.partition("://")
+    return _ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _engine_options(url: str) -> dict:
+    options = {
+        "echo": settings.DB_ECHO,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "query_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+    }
+    if _is_sqlite(url):
+        options["connect_args"] = {"check_same_thread": False}
+    if ":memory:" in url or url.rstrip("/").endswith(":"):
+        # Pool sizing doesn't apply to in-memory SQLite
+        return options
+
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE or -1,
+    )
+    if "+asyncpg" in url:
+        options["connect_args"] = {"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+    return options
+
+
+# =========================
+# SLOW QUERY LOG
+# =========================
+def _log_slow_queries(sync_engine):
+    """Log statements slower than DB_SLOW_QUERY_MS (off when 0)"""
+    if settings.DB_SLOW_QUERY_MS <= 0:
+        return
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _finish(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+        if elapsed_ms >= settings.DB_SLOW_QUERY_MS:
+            logger.warning("Slow query (%.1f ms): %s", elapsed_ms, statement)
+
+
+# =========================
+# COMMIT TIMING
+# =========================
+# Flush + COMMIT, for the db_commit stage of /metrics. Session events also
+# fire for AsyncSession, which runs on a sync Session underneath
+@event.listens_for(Session, "before_commit")
+def _commit_started(session):
+    session.info["commit_start"] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_commit")
+def _commit_finished(session):
+    started = session.info.pop("commit_start", None)
+    if started is not None:
+        stage_latency.observe(time.perf_counter() - started, "db_commit")
+
+
+# =========================
+# ENGINES / SESSIONS
+# =========================
+# Sync engine: table creation at startup, scripts and any remaining
+# blocking code (run it through run_blocking("db", ...))
+engine = create_engine(settings.DATABASE_URL, **_engine_options(settings.DATABASE_URL))
+_log_slow_queries(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine: used by the API routes, so queries never tie up a thread
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or async_url(settings.DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL))
+_log_slow_queries(async_engine.sync_engine)
+
+# Objects stay usable after commit, so routes can return them directly
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -23,3 +120,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
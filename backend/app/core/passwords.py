@@ -0,0 +1,105 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from app.core.config import settings
+
+# Hashes made with other rounds still verify; verify_and_update() flags
+# them so they are rehashed at the current cost on the next login
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(password, hashed_password)
+
+
+def verify_and_update(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """(matches, new hash if the stored one uses outdated parameters, else None)"""
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+# =========================
+# HASHING POOL
+# =========================
+# bcrypt holds the GIL for its whole run, so it goes to worker processes,
+# not threads. At most PASSWORD_HASH_MAX_PENDING hashes are queued or
+# running per API process; past that, requests get 503 straight away.
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_pending = 0
+
+
+def _workers() -> int:
+    return settings.PASSWORD_HASH_WORKERS or min(4, os.cpu_count() or 1)
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn: never fork an event loop and its threads
+                _executor = ProcessPoolExecutor(
+                    max_workers=_workers(), mp_context=multiprocessing.get_context("spawn")
+                )
+    return _executor
+
+
+def _replace_executor(broken: ProcessPoolExecutor) -> None:
+    """Drop a pool a dead worker broke; the next call starts a fresh one."""
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pool() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+async def _run(fn, *args):
+    global _pending
+    if _pending >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ins in progress, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    _pending += 1
+    try:
+        # One retry: a worker killed mid-hash (OOM, crash) breaks the
+        # whole pool, which would otherwise fail every later sign-in
+        for attempt in range(2):
+            executor = _get_executor()
+            try:
+                return await asyncio.wrap_future(executor.submit(fn, *args))
+            except BrokenProcessPool:
+                _replace_executor(executor)
+                if attempt:
+                    raise
+    finally:
+        _pending -= 1
+
+
+async def ahash_password(password: str) -> str:
+    return await _run(hash_password, password)
+
+
+async def averify_and_update(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return await _run(verify_and_update, password, hashed_password)
@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from app.core.config import settings
+
+
+class Principal(NamedTuple):
+    """The parts of a User that authenticated routes read."""
+    id: int
+    email: str | None
+    name: str | None
+    provider: str | None
+
+
+class PrincipalCache:
+    """
+    user id -> Principal, so authenticated requests skip the users lookup.
+
+    Entries expire after `ttl` seconds and the least recently used are
+    evicted past `max_entries`. invalidate() drops a user whose row
+    changed; a load that started before the invalidation is not cached.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._entries: OrderedDict[int, tuple[float, Principal]] = OrderedDict()
+        self._version = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def version(self) -> int:
+        """Take before loading from the database; pass to put()."""
+        return self._version
+
+    def get(self, user_id: int) -> Principal | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                created_at, principal = entry
+                if now - created_at < self.ttl:
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return principal
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+
+    def put(self, principal: Principal, version: int | None = None) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            # Something was invalidated while this principal was loading
+            if version is not None and version != self._version:
+                return
+            self._entries[principal.id] = (time.monotonic(), principal)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._version += 1
+            self.invalidations += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+principal_cache = PrincipalCache(
+    ttl=settings.PRINCIPAL_CACHE_TTL,
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+)
@@ -1,25 +1,17 @@
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import AsyncSessionLocal
+from app.core.passwords import hash_password, verify_password  # re-exported
+from app.core.principal_cache import Principal, principal_cache
 from app.models.user import User
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-
-def verify_password(password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(password, hashed_password)
-
-
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -35,19 +27,55 @@ def verify_token(token: str):
         return None
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _token_user_id(token: str = Depends(oauth2_scheme)) -> int:
     payload = verify_token(token)
     if payload is None:
-        raise credentials_exception
-    user_id: int = payload.get("sub")
-    if user_id is None:
-        raise credentials_exception
-    user = db.query(User).filter(User.id == user_id).first()
+        raise _credentials_exception()
+    try:
+        return int(payload.get("sub"))
+    except (TypeError, ValueError):
+        raise _credentials_exception()
+
+
+async def get_current_user(user_id: int = Depends(_token_user_id)) -> Principal:
+    """
+    The authenticated user as a Principal, from the principal cache or,
+    on a miss, one primary-key lookup. 401 once the user no longer exists.
+    """
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    version = principal_cache.version()
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
     if user is None:
-        raise credentials_exception
-    return user
+        raise _credentials_exception()
+
+    principal = Principal(user.id, user.email, user.name, user.provider)
+    principal_cache.put(principal, version)
+    return principal
+
+
+async def get_current_user_id(principal: Principal = Depends(get_current_user)) -> int:
+    """
+    Id of the authenticated user, for routes that only scope queries by
+    owner id; the user is checked through the principal cache, so a hit
+    costs no database round-trip.
+    """
+    return principal.id
+
+
+# Any ORM change to a user drops its cached principal
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_principal(mapper, connection, target):
+    principal_cache.invalidate(target.id)
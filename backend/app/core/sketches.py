@@ -0,0 +1,215 @@
+import copy
+import gzip
+import json
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Blobs are recognised by their magic bytes, so rows written with either
+# codec stay readable when SKETCH_COMPRESSION changes
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+class SketchError(ValueError):
+    """A delta that can't be applied to the stored sketch."""
+
+
+# =========================
+# CODEC
+# =========================
+def compress(text: str) -> bytes:
+    data = text.encode("utf-8")
+    if settings.SKETCH_COMPRESSION == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=settings.SKETCH_COMPRESSION_LEVEL).compress(data)
+    return gzip.compress(data, compresslevel=min(settings.SKETCH_COMPRESSION_LEVEL, 9), mtime=0)
+
+
+def decompress(blob: bytes) -> str:
+    if blob.startswith(_ZSTD_MAGIC):
+        if zstandard is None:
+            raise RuntimeError("Sketch is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(blob).decode("utf-8")
+    if blob.startswith(_GZIP_MAGIC):
+        return gzip.decompress(blob).decode("utf-8")
+    return blob.decode("utf-8")
+
+
+def check_size(text: str) -> None:
+    """413 for a sketch over SKETCH_MAX_BYTES, wherever it is written from."""
+    if len(text.encode("utf-8")) > settings.SKETCH_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Sketch too large")
+
+
+def etag(project_id: int, version: int) -> str:
+    return f'"{project_id}.{version}"'
+
+
+def load(text: str | None) -> dict:
+    """Sketch JSON -> document; an empty sketch is a canvas without lines."""
+    if not text:
+        return {"lines": []}
+    try:
+        doc = json.loads(text)
+    except ValueError:
+        raise SketchError("Stored sketch is not valid JSON")
+    if not isinstance(doc, dict):
+        raise SketchError("Sketch must be a JSON object")
+    return doc
+
+
+def dump(doc: dict) -> str:
+    return json.dumps(doc, separators=(",", ":"))
+
+
+# =========================
+# DELTAS
+# =========================
+def append_lines(doc: dict, lines: list) -> dict:
+    """Append react-canvas-draw strokes to the sketch's `lines`."""
+    existing = doc.get("lines")
+    if existing is None:
+        existing = doc["lines"] = []
+    if not isinstance(existing, list):
+        raise SketchError("Sketch `lines` is not a list")
+    existing.extend(lines)
+    return doc
+
+
+def _pointer(path) -> list[str]:
+    # RFC 6901
+    if not isinstance(path, str):
+        raise SketchError(f"Invalid JSON pointer {path!r}")
+    if path == "":
+        return []
+    if not path.startswith("/"):
+        raise SketchError(f"Invalid JSON pointer {path!r}")
+    return [part.replace("~1", "/").replace("~0", "~") for part in path[1:].split("/")]
+
+
+def _index(container: list, key: str, allow_end: bool = False) -> int:
+    if allow_end and key == "-":
+        return len(container)
+    if not key.isdigit() or (len(key) > 1 and key.startswith("0")):
+        raise SketchError(f"Invalid array index {key!r}")
+    index = int(key)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise SketchError(f"Array index {key} out of range")
+    return index
+
+
+def _parent(doc, parts: list[str]):
+    target = doc
+    for key in parts[:-1]:
+        if isinstance(target, list):
+            target = target[_index(target, key)]
+        elif isinstance(target, dict) and key in target:
+            target = target[key]
+        else:
+            raise SketchError(f"Path segment {key!r} not found")
+    return target
+
+
+def _get(doc, parts: list[str]):
+    if not parts:
+        return doc
+    parent, key = _parent(doc, parts), parts[-1]
+    if isinstance(parent, list):
+        return parent[_index(parent, key)]
+    if isinstance(parent, dict) and key in parent:
+        return parent[key]
+    raise SketchError(f"Path segment {key!r} not found")
+
+
+def _add(doc, parts: list[str], value):
+    if not parts:
+        return value
+    parent, key = _parent(doc, parts), parts[-1]
+    if isinstance(parent, list):
+        parent.insert(_index(parent, key, allow_end=True), value)
+    elif isinstance(parent, dict):
+        parent[key] = value
+    else:
+        raise SketchError(f"Can't add to a {type(parent).__name__}")
+    return doc
+
+
+def _remove(doc, parts: list[str]):
+    if not parts:
+        raise SketchError("Can't remove the whole sketch")
+    parent, key = _parent(doc, parts), parts[-1]
+    if isinstance(parent, list):
+        return parent.pop(_index(parent, key))
+    if isinstance(parent, dict) and key in parent:
+        return parent.pop(key)
+    raise SketchError(f"Path segment {key!r} not found")
+
+
+def apply_patch(doc: dict, operations: list[dict]) -> dict:
+    """
+    Apply an RFC 6902 JSON Patch. All-or-nothing: the document passed in
+    is left untouched if any operation fails.
+    """
+    doc = copy.deepcopy(doc)
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise SketchError("Patch operations must be objects")
+        op = operation.get("op")
+        parts = _pointer(operation.get("path"))
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise SketchError(f"{op!r} needs a value")
+
+        if op == "add":
+            doc = _add(doc, parts, copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            _remove(doc, parts)
+        elif op == "replace":
+            _get(doc, parts)
+            if not parts:
+                doc = copy.deepcopy(operation["value"])
+            else:
+                _remove(doc, parts)
+                doc = _add(doc, parts, copy.deepcopy(operation["value"]))
+        elif op in ("move", "copy"):
+            source = _pointer(operation.get("from"))
+            if op == "move" and parts[:len(source)] == source and parts != source:
+                raise SketchError("Can't move a value into itself")
+            value = _remove(doc, source) if op == "move" else copy.deepcopy(_get(doc, source))
+            doc = _add(doc, parts, value)
+        elif op == "test":
+            if _get(doc, parts) != operation["value"]:
+                raise SketchError(f"Test failed at {operation.get('path')!r}")
+        else:
+            raise SketchError(f"Unsupported patch op {op!r}")
+
+    if not isinstance(doc, dict):
+        raise SketchError("Sketch must be a JSON object")
+    return doc
+
+
+# =========================
+# PROJECT COLUMNS
+# =========================
+def store(project, blob: bytes) -> None:
+    """
+    Full replacement on a loaded Project: new compressed sketch, legacy
+    text dropped, version bumped in SQL so concurrent writers can't reuse it.
+    """
+    project.sketch_blob = blob
+    project.sketch_data = None
+    project.sketch_version = type(project).sketch_version + 1
+
+
+def content_encoding(blob: bytes) -> str | None:
+    """HTTP Content-Encoding a stored blob can be sent with as-is."""
+    if blob.startswith(_ZSTD_MAGIC):
+        return "zstd"
+    if blob.startswith(_GZIP_MAGIC):
+        return "gzip"
+    return None
@@ -0,0 +1,87 @@
+import difflib
+import hashlib
+from typing import Iterator
+
+from sqlalchemy import delete, exists, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.version import DesignText, DesignVersion
+
+_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+async def _put_text(db: AsyncSession, text: str | None) -> str | None:
+    """Store `text` once, whoever stored it first; returns its digest."""
+    if text is None:
+        return None
+    key = digest(text)
+    insert = _INSERTS.get(db.get_bind().dialect.name)
+    if insert is not None:
+        await db.execute(
+            insert(DesignText).values(digest=key, body=text, size=len(text)).on_conflict_do_nothing()
+        )
+    elif await db.get(DesignText, key) is None:
+        db.add(DesignText(digest=key, body=text, size=len(text)))
+        await db.flush()
+    return key
+
+
+async def record(db: AsyncSession, project_id: int, narrative: str, compliance: str | None,
+                 brief: str | None = None, design_concept_url: str | None = None) -> DesignVersion:
+    """
+    Add a version for one generate_design run to the session; committed
+    with the caller's project update.
+    """
+    version = DesignVersion(
+        project_id=project_id,
+        narrative_digest=await _put_text(db, narrative),
+        compliance_digest=await _put_text(db, compliance),
+        brief_digest=await _put_text(db, brief),
+        design_concept_url=design_concept_url,
+    )
+    db.add(version)
+    return version
+
+
+async def delete_project_versions(db: AsyncSession, project_id: int) -> None:
+    """Drop a project's versions, then any texts no other version uses."""
+    result = await db.execute(
+        select(DesignVersion.narrative_digest, DesignVersion.compliance_digest, DesignVersion.brief_digest)
+        .where(DesignVersion.project_id == project_id)
+    )
+    digests = {key for row in result for key in row if key}
+    await db.execute(delete(DesignVersion).where(DesignVersion.project_id == project_id))
+
+    digests = list(digests)
+    for i in range(0, len(digests), 500):
+        chunk = digests[i:i + 500]
+        still_used = exists().where(or_(
+            DesignVersion.narrative_digest == DesignText.digest,
+            DesignVersion.compliance_digest == DesignText.digest,
+            DesignVersion.brief_digest == DesignText.digest,
+        ))
+        await db.execute(delete(DesignText).where(DesignText.digest.in_(chunk), ~still_used))
+
+
+async def load_texts(db: AsyncSession, digests: list[str | None]) -> dict[str, str]:
+    keys = [key for key in set(digests) if key]
+    if not keys:
+        return {}
+    result = await db.execute(select(DesignText.digest, DesignText.body).where(DesignText.digest.in_(keys)))
+    return dict(result.all())
+
+
+def diff_lines(label: str, old: str, new: str, old_name: str, new_name: str) -> Iterator[str]:
+    """Unified diff of one field, produced line by line."""
+    if old == new:
+        return
+    yield f"### {label}\n"
+    for line in difflib.unified_diff(
+        old.splitlines(keepends=True), new.splitlines(keepends=True), old_name, new_name
+    ):
+        yield line if line.endswith("\n") else line + "\n"
@@ -1,4 +1,5 @@
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.auth import router as auth_router
 # Import other routers - using direct imports for stability
@@ -12,12 +13,83 @@ try:
 except ImportError:
     ai_router = None
 
+try:
+    from app.ai.router import router as ai_ask_router
+except ImportError:
+    ai_ask_router = None
+
+from sqlalchemy import insert, inspect, select, text, update
+from sqlalchemy.schema import CreateColumn
 from app.core.database import Base, engine
+from app.core.versions import digest
+from app.models.project import Project
+from app.models.version import DesignText, DesignVersion
+from app.core.passwords import shutdown_pool
+from app.core.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, render as render_metrics
 
 # Create database tables on startup
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Architectural Design Assistant")
+# create_all skips tables that already exist: add newer columns and the
+# listing index there, and give projects saved before updated_at had a
+# default one
+with engine.begin() as conn:
+    existing = {column["name"] for column in inspect(conn).get_columns(Project.__tablename__)}
+    for column in Project.__table__.columns:
+        if column.name not in existing:
+            conn.execute(text(
+                f"ALTER TABLE {Project.__tablename__} ADD COLUMN {CreateColumn(column).compile(dialect=conn.dialect)}"
+            ))
+    for index in Project.__table__.indexes:
+        index.create(bind=conn, checkfirst=True)
+    conn.execute(
+        update(Project).where(Project.updated_at.is_(None)).values(updated_at=Project.created_at)
+    )
+
+# design_versions used to hold its texts inline (ai_output /
+# compliance_report): rebuild it in the content-addressed layout, keeping
+# the old rows as versions
+with engine.begin() as conn:
+    existing = {column["name"] for column in inspect(conn).get_columns(DesignVersion.__tablename__)}
+    if "narrative_digest" not in existing:
+        legacy = conn.execute(text(
+            f"SELECT id, project_id, ai_output, compliance_report FROM {DesignVersion.__tablename__}"
+        )).all()
+        conn.execute(text(f"DROP TABLE {DesignVersion.__tablename__}"))
+        DesignVersion.__table__.create(bind=conn)
+
+        texts, rows = {}, []
+        for version_id, project_id, narrative, compliance in legacy:
+            if project_id is None:
+                continue
+            narrative = narrative or ""
+            texts[digest(narrative)] = narrative
+            if compliance is not None:
+                texts[digest(compliance)] = compliance
+            rows.append({
+                "id": version_id,
+                "project_id": project_id,
+                "narrative_digest": digest(narrative),
+                "compliance_digest": digest(compliance) if compliance is not None else None,
+            })
+        stored = set(conn.execute(select(DesignText.digest)).scalars())
+        new_texts = [
+            {"digest": key, "body": body, "size": len(body)}
+            for key, body in texts.items() if key not in stored
+        ]
+        if new_texts:
+            conn.execute(insert(DesignText), new_texts)
+        if rows:
+            conn.execute(insert(DesignVersion), rows)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    shutdown_pool()
+
+
+app = FastAPI(title="Architectural Design Assistant", lifespan=lifespan)
 
 # --- CORS CONFIGURATION ---
 # Handles both localhost and 127.0.0.1 across common React ports
@@ -34,16 +106,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
-# --- DEBUG LOGGER ---
-# This will show the exact URL and Status in your terminal
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    print(f"DEBUG: Incoming {request.method} to {request.url}")
-    response = await call_next(request)
-    print(f"DEBUG: Response Status: {response.status_code}")
-    return response
+# --- METRICS ---
+# Request latency by route and status; scrape GET /metrics
+app.add_middleware(MetricsMiddleware)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
 
 # --- ROUTER REGISTRATION ---
 
@@ -62,6 +134,12 @@ if ai_router:
 else:
     print("WARNING: ai_router could not be loaded")
 
+# 4. AI Q&A: /ai/ask lives in app/ai/router.py
+if ai_ask_router:
+    app.include_router(ai_ask_router)
+else:
+    print("WARNING: ai_ask_router could not be loaded")
+
 @app.get("/")
 def health_check():
     return {"status": "ok", "message": "Backend is reachable"}
\ No newline at end of file
@@ -1,19 +1,36 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, JSON
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, JSON, Index, LargeBinary
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from app.core.database import Base
 
+# SQLite stores CURRENT_TIMESTAMP without microseconds; bind values the same
+# way so keyset cursors compare equal to the stored text
+_Timestamp = DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite",
+)
+
 class Project(Base):
     __tablename__ = "projects"
+    __table_args__ = (
+        # Listing: one owner's projects, most recently updated first
+        Index("ix_projects_owner_updated", "owner_id", "updated_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     description = Column(Text, nullable=True)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    sketch_data = Column(Text, nullable=True)  # JSON string from canvas
+    # Sketch JSON from the canvas, compressed (app.core.sketches). Loaded only by
+    # the sketch endpoints; sketch_data holds older uncompressed sketches until
+    # their next write
+    sketch_blob = deferred(Column(LargeBinary, nullable=True), group="sketch")
+    sketch_data = deferred(Column(Text, nullable=True), group="sketch")
+    sketch_version = Column(Integer, nullable=False, default=0, server_default="0")  # ETag
     design_concept_url = Column(String, nullable=True)
     design_narrative = Column(Text, nullable=True)
     compliance_notes = Column(Text, nullable=True)
     extra_data = Column(JSON, nullable=True)  # For additional data (renamed from metadata - reserved in SQLAlchemy)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(_Timestamp, default=func.now(), server_default=func.now(), onupdate=func.now())
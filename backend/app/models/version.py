@@ -1,10 +1,28 @@
-from sqlalchemy import Column, Integer, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, Index
+from sqlalchemy.sql import func
 from app.core.database import Base
 
+class DesignText(Base):
+    # Content-addressed: one row per distinct text, shared by every version
+    # (in any project) that produced it
+    __tablename__ = "design_texts"
+
+    digest = Column(String(64), primary_key=True)  # sha256 hex of body
+    body = Column(Text, nullable=False)
+    size = Column(Integer, nullable=False)  # characters
+
 class DesignVersion(Base):
+    # One row per generate_design run; the text itself lives in design_texts
     __tablename__ = "design_versions"
+    __table_args__ = (
+        # History: one project's versions, newest first
+        Index("ix_design_versions_project", "project_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("projects.id"))
-    ai_output = Column(Text)
-    compliance_report = Column(Text)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    narrative_digest = Column(String(64), ForeignKey("design_texts.digest"), nullable=False)
+    compliance_digest = Column(String(64), ForeignKey("design_texts.digest"), nullable=True)
+    brief_digest = Column(String(64), ForeignKey("design_texts.digest"), nullable=True)
+    design_concept_url = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
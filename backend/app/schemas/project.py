@@ -25,11 +25,24 @@ class ProjectResponse(BaseModel):
     title: str
     description: Optional[str] = None
     owner_id: int
-    sketch_data: Optional[str] = None
+    sketch_version: int = 0  # the sketch itself: GET /projects/{id}/sketch
     design_concept_url: Optional[str] = None
     design_narrative: Optional[str] = None
     compliance_notes: Optional[str] = None
     created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class ProjectSummary(BaseModel):
+    # Listing columns only; sketch and design text come from GET /projects/{id}
+    id: int
+    title: str
+    description: Optional[str] = None
+    design_concept_url: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
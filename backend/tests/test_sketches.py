@@ -0,0 +1,77 @@
+import pytest
+
+from app.core.sketches import SketchError, apply_patch
+
+
+def doc():
+    return {"lines": [{"id": 1}, {"id": 2}], "width": 400}
+
+
+def test_add_appends_with_dash_and_inserts_at_index():
+    out = apply_patch(doc(), [
+        {"op": "add", "path": "/lines/-", "value": {"id": 3}},
+        {"op": "add", "path": "/lines/0", "value": {"id": 0}},
+    ])
+    assert [line["id"] for line in out["lines"]] == [0, 1, 2, 3]
+
+
+def test_add_past_the_end_is_rejected():
+    with pytest.raises(SketchError):
+        apply_patch(doc(), [{"op": "add", "path": "/lines/3", "value": {}}])
+
+
+def test_remove_and_replace():
+    out = apply_patch(doc(), [
+        {"op": "remove", "path": "/lines/0"},
+        {"op": "replace", "path": "/width", "value": 800},
+    ])
+    assert out == {"lines": [{"id": 2}], "width": 800}
+
+
+@pytest.mark.parametrize("path", ["/lines/2", "/lines/-", "/lines/01", "/height"])
+def test_remove_out_of_range_or_missing(path):
+    with pytest.raises(SketchError):
+        apply_patch(doc(), [{"op": "remove", "path": path}])
+
+
+def test_move_and_copy():
+    out = apply_patch(doc(), [
+        {"op": "copy", "from": "/lines/0", "path": "/first"},
+        {"op": "move", "from": "/lines/1", "path": "/lines/0"},
+    ])
+    assert out["first"] == {"id": 1}
+    assert [line["id"] for line in out["lines"]] == [2, 1]
+
+
+def test_move_into_itself_is_rejected():
+    with pytest.raises(SketchError):
+        apply_patch(doc(), [{"op": "move", "from": "/lines", "path": "/lines/0"}])
+
+
+def test_failed_test_leaves_the_document_untouched():
+    original = doc()
+    with pytest.raises(SketchError):
+        apply_patch(original, [
+            {"op": "remove", "path": "/lines/0"},
+            {"op": "test", "path": "/width", "value": 1},
+        ])
+    assert original == doc()
+
+
+def test_pointer_escapes():
+    out = apply_patch({}, [{"op": "add", "path": "/a~1b~0c", "value": 1}])
+    assert out == {"a/b~c": 1}
+
+
+@pytest.mark.parametrize("operation", [
+    {"op": "add", "path": 5, "value": 1},
+    {"op": "move", "from": None, "path": "/x"},
+    {"op": "copy", "path": "/x"},
+    {"op": "add", "path": "lines", "value": 1},
+    {"op": "add", "path": "/x"},
+    {"op": "frobnicate", "path": "/x"},
+    "remove",
+])
+def test_malformed_operations_raise_sketch_error(operation):
+    with pytest.raises(SketchError):
+        apply_patch(doc(), [operation])